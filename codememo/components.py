@@ -1,5 +1,6 @@
-import time, re, math
+import os, stat, itertools, re, math, weakref
 from pathlib import Path
+from textwrap import wrap as wrap_text
 
 from .vendor import imgui
 from .vendor.imgui import Vec2 as _Vec2
@@ -17,6 +18,17 @@ from .internal import GlobalState
 CODE_CHAR_WIDTH = 8
 CODE_CHAR_HEIGHT = 14
 
+# Enums of `imgui` used by windows rendered every frame, they are bound here to
+# save attribute lookups on the module.
+_STYLE_ITEM_SPACING = imgui.STYLE_ITEM_SPACING
+_COLOR_BUTTON = imgui.COLOR_BUTTON
+_COLOR_BUTTON_HOVERED = imgui.COLOR_BUTTON_HOVERED
+_COLOR_BUTTON_ACTIVE = imgui.COLOR_BUTTON_ACTIVE
+_COLOR_HEADER = imgui.COLOR_HEADER
+_WINDOW_NO_SCROLLBAR = imgui.WINDOW_NO_SCROLLBAR
+_WINDOW_HORIZONTAL_SCROLLING_BAR = imgui.WINDOW_HORIZONTAL_SCROLLING_BAR
+_CANVAS_WINDOW_FLAGS = imgui.WINDOW_NO_SCROLLBAR | imgui.WINDOW_NO_MOVE
+
 
 __all__ = [
     'ImguiComponent',
@@ -33,17 +45,15 @@ __all__ = [
 
 
 class Vec2(_Vec2):
-    def __add__(self, *val):
-        return Vec2(
-            self.x + sum([v.x for v in val]),
-            self.y + sum([v.y for v in val]),
-        )
+    # NOTE: Without this, every instance would carry a `__dict__` in addition
+    # to the tuple storage.
+    __slots__ = ()
+
+    def __add__(self, val):
+        return Vec2(self.x + val.x, self.y + val.y)
 
     def __sub__(self, val):
-        return Vec2(
-            self.x - val.x,
-            self.y - val.y,
-        )
+        return Vec2(self.x - val.x, self.y - val.y)
 
     def __mul__(self, val):
         return Vec2(self.x * val, self.y * val)
@@ -55,7 +65,14 @@ class Vec2(_Vec2):
         return f'<Vec2 ({self.x}, {self.y})>'
 
 
+# Constant vectors used while rendering, they are created once here to avoid
+# allocating new ones every frame.
+_VEC2_ZERO = Vec2(0.0, 0.0)
+_VEC2_ONE = Vec2(1.0, 1.0)
+
 class ImguiComponent(object):
+    __slots__ = ()
+
     def render(self):
         raise NotImplementedError
 
@@ -182,6 +199,38 @@ class MenuBar(ImguiComponent):
             self.file_dialog = OpenFileDialog(self.app, self._import_from_file)
 
 
+# Rows split from content of snippets, keyed by `Node` since `Snippet` is not
+# weak-referenceable. Values are in the form of `(content, rows, max_row_length)`,
+# and cached rows are reused only when content of snippet is still the same object.
+_SNIPPET_ROWS_CACHE = weakref.WeakKeyDictionary()
+
+
+def _get_snippet_rows(node):
+    """Get rows of snippet content and the length of the longest row."""
+    content = node.snippet.content
+    cached = _SNIPPET_ROWS_CACHE.get(node)
+    if cached is not None and cached[0] is content:
+        return cached[1], cached[2]
+    rows = content.splitlines() or ['']
+    max_row_length = max(map(len, rows))
+    _SNIPPET_ROWS_CACHE[node] = (content, rows, max_row_length)
+    return rows, max_row_length
+
+
+def _iter_visible_rows(n_rows):
+    """Iterate indices of rows which are visible in current window. All
+    indices are iterated if `ListClipper` is not supported by `pyimgui`.
+    """
+    if not hasattr(imgui, 'ListClipper'):
+        yield from range(n_rows)
+        return
+    clipper = imgui.ListClipper()
+    clipper.begin(n_rows)
+    while clipper.step():
+        yield from range(clipper.display_start, clipper.display_end)
+    clipper.end()
+
+
 class CodeSnippetWindow(ImguiComponent):
     """A window to show code snippet."""
     DEFAULT_SNIPPET_WINDOW_HEIGHT = -140
@@ -202,8 +251,10 @@ class CodeSnippetWindow(ImguiComponent):
 
         self.node = node
         self.snippet = node.snippet
-        rows = self.snippet.content.splitlines()
-        self.rows = [''] if len(rows) == 0 else rows
+        self.rows, self._max_row_length = _get_snippet_rows(node)
+        # Strings of line numbers, see also `self.get_line_numbers()`
+        self._line_numbers = []
+        self._line_numbers_key = None
 
         self.event_registry = NodeEventRegistry.get_instance()
 
@@ -214,9 +265,13 @@ class CodeSnippetWindow(ImguiComponent):
         self.height = max_height
         self.calculate_window_size()
 
-        self.selected = [False] * len(self.rows)
+        self.reset_selected()
         self.reference_info = None
         self.window_opened = False
+        # Request focus when this window is rendered next time. It has to be
+        # requested right before `begin()` of this window, otherwise another
+        # window begun in between would take it.
+        self.focus_on_next_render = False
 
         self.collapsing_header_expanded = True
         self.snippet_window_height = self.DEFAULT_SNIPPET_WINDOW_HEIGHT
@@ -249,14 +304,30 @@ class CodeSnippetWindow(ImguiComponent):
         # the same name as this node being displayed in the same window.
         return f'snippet: {self.snippet.name} ###{self.node.uuid}'
 
+    @property
+    def reference_info(self):
+        return self._reference_info
+
+    @reference_info.setter
+    def reference_info(self, value):
+        """Set information of lines to highlight. Range of those lines is
+        resolved here as `[start, stop)`, so that we don't have to look it up
+        through `ReferenceInfo` for every row while rendering."""
+        self._reference_info = value
+        if value is None:
+            self._ref_range = None
+        else:
+            line_info = value.line_info
+            stop = line_info.start if line_info.stop is None else line_info.stop
+            self._ref_range = (line_info.start, stop + 1)
+
     def calculate_window_size(self):
         n_digit = len('%i' % (len(self.rows) + self.snippet.line_start - 1))
         snippet_height = (len(self.rows) + 2) * CODE_CHAR_HEIGHT
         self._snippet_height = snippet_height
         self.width_lineno = CODE_CHAR_WIDTH * n_digit
 
-        max_row = max([len(v) for v in self.rows])
-        self.width_code = max(max_row * CODE_CHAR_WIDTH + 30, self._min_width)
+        self.width_code = max(self._max_row_length * CODE_CHAR_WIDTH + 30, self._min_width)
 
         total_width = self.width_lineno + self.width_code + 30
         self.width = min(max(total_width, self._min_width), self._max_width)
@@ -264,61 +335,73 @@ class CodeSnippetWindow(ImguiComponent):
         total_height = snippet_height + self.DEFAULT_COMMENT_WINDOW_HEIGHT + 20
         self.height = min(max(total_height, self._min_height), self._max_height)
 
+    def get_line_numbers(self):
+        """Get strings of line numbers to display. They are cached until the
+        number of rows or the first line number of snippet is changed."""
+        key = (self.snippet.line_start, len(self.rows))
+        if key != self._line_numbers_key:
+            line_start, n_rows = key
+            self._line_numbers = [str(line_start + i) for i in range(n_rows)]
+            self._line_numbers_key = key
+        return self._line_numbers
+
     def reset_selected(self):
-        self.selected = [False] * len(self.rows)
+        # Selected rows are stored as a bitmask, the i-th bit is set if the
+        # i-th row is selected.
+        self.selected_mask = 0
+        # Indices of the first and last selected rows, they are maintained along
+        # with `self.selected_mask` so that we don't have to scan it.
+        self._first_selected_idx = -1
+        self._last_selected_idx = -1
+
+    def select_rows(self, first, last):
+        """Select rows in the range of `[first, last]`. Note that selection
+        should be reset before calling this."""
+        self.selected_mask |= (1 << (last + 1)) - (1 << first)
+        self._first_selected_idx = first
+        self._last_selected_idx = last
 
     def get_selected_lines(self):
-        start = self.selected.index(True) + 1
-        stop = len(self.selected) - self.selected[::-1].index(True)
+        start = self._first_selected_idx + 1
+        stop = self._last_selected_idx + 1
         stop = stop if start != stop else None
-        if stop and not all(self.selected[start:stop]):
+        if stop and self.selected_mask != (1 << stop) - (1 << (start - 1)):
             raise RuntimeError('Seleted rows are not contiguous')
         return start, stop
 
-    def handle_selectable_row(self, i, row):
-        """Deal with range selection by SHIFT key + click. Possible conditions:
-        1. not clicked:
-            do nothing.
-        2. clicked, no selected item:
+    def handle_selectable_row(self, i, key_shift):
+        """Deal with range selection by SHIFT key + click on the i-th row.
+        Possible conditions:
+        1. clicked, no selected item:
             set first selected item.
-        3. clicked with SHIFT key, there is already a selected item:
+        2. clicked with SHIFT key, there is already a selected item:
             set True to all items in the range of previously and currently selected ones.
-        4. clicked without SHIFT key, there is already a selected item:
+        3. clicked without SHIFT key, there is already a selected item:
             clear all selection and set current item to selected.
         """
-        highlighted = (self.reference_info is not None) and self.reference_info.line_info.in_range(i+1)
-        if highlighted:
-            imgui.push_style_color(imgui.COLOR_HEADER, 0.5, 0.8, 0.5, 0.4)
-            clicked, selected = imgui.selectable(row, selected=True)
-            imgui.pop_style_color()
+        if self.selected_mask == 0:
+            self.select_rows(i, i)
+        elif key_shift:
+            idx_curr = i
+            idx_prev = self._first_selected_idx
+            self.reset_selected()
+            if idx_prev > idx_curr:
+                idx_prev, idx_curr = idx_curr, idx_prev
+            self.select_rows(idx_prev, idx_curr)
         else:
-            clicked, selected = imgui.selectable(row, selected=self.selected[i])
-
-        if clicked:
-            if not any(self.selected):
-                self.selected[i] = True
-            elif imgui.get_io().key_shift:
-                idx_curr = i
-                idx_prev = self.selected.index(True)
-                self.reset_selected()
-                if idx_prev > idx_curr:
-                    idx_prev, idx_curr = idx_curr, idx_prev
-                len_range = idx_curr - idx_prev + 1
-                self.selected[idx_prev:idx_curr] = [True] * len_range
-            else:
-                self.reset_selected()
-                self.selected[i] = True
+            self.reset_selected()
+            self.select_rows(i, i)
 
     def handle_hsplitter(self):
         if self.collapsing_header_expanded:
-            imgui.push_style_color(imgui.COLOR_BUTTON, 1, 1, 1, 0.1)
-            imgui.push_style_color(imgui.COLOR_BUTTON_HOVERED, 1, 1, 1, 0.1)
-            imgui.push_style_color(imgui.COLOR_BUTTON_ACTIVE, 1, 1, 1, 0.1)
+            imgui.push_style_color(_COLOR_BUTTON, 1, 1, 1, 0.1)
+            imgui.push_style_color(_COLOR_BUTTON_HOVERED, 1, 1, 1, 0.1)
+            imgui.push_style_color(_COLOR_BUTTON_ACTIVE, 1, 1, 1, 0.1)
             imgui.begin_group()
-            imgui.invisible_button('##spacing', *imgui.Vec2(-1, 3))
+            imgui.invisible_button('##spacing', -1, 3)
             imgui.set_cursor_pos_x(10)
-            imgui.button('##hsplitter', *imgui.Vec2(-5, 2))
-            imgui.invisible_button('##spacing', *imgui.Vec2(-1, 3))
+            imgui.button('##hsplitter', -5, 2)
+            imgui.invisible_button('##spacing', -1, 3)
             imgui.end_group()
             imgui.pop_style_color(3)
 
@@ -335,62 +418,52 @@ class CodeSnippetWindow(ImguiComponent):
                 if imgui.is_mouse_double_clicked():
                     self.snippet_window_height = self.DEFAULT_SNIPPET_WINDOW_HEIGHT
         else:
-            imgui.invisible_button('##hsplitter', *imgui.Vec2(-1, 8))
-
-    def create_context_menu(self):
-        states = {'opened': False}
-
-        def context_menu(is_any_row_selected):
-            if not states['opened']:
-                states['opened'] = imgui.begin_popup_context_item('context-menu', mouse_button=2)
-            else:
-                return
-
-            if states['opened']:
-                # Show property window
-                if imgui.selectable('Properties')[0]:
-                    if self.property_window is None:
-                        self.property_window = CodeSnippetPropertyWindow(
-                            self.snippet, self.node.uuid,
-                            initial_position=Vec2(*imgui.get_mouse_pos())
-                        )
-                        self.property_window.window_opened = True
-
-                # Prepare to enter edit mode
-                if imgui.selectable('Edit')[0]:
-                    self.is_edit_mode = True
-                    self.edited_content = self.node.snippet.content
-
-                # Clear highlighted lines
-                if self.reference_info is not None and imgui.selectable('Clear highlight')[0]:
-                    self.reference_info = None
-
-                # Add the following menu items only when lines are selected
-                if is_any_row_selected:
-                    imgui.separator()
-                    if imgui.selectable('Add leaf reference')[0]:
-                        ref_start, ref_stop = self.get_selected_lines()
-                        event_args = dict(
-                            root_node=self.node,
-                            ref_start=ref_start,
-                            ref_stop=ref_stop,
-                        )
-                        event = NodeEvent(f'add_reference_##{self.container_id}', event_args)
-                        self.event_registry.dispatch(event)
-                    if imgui.selectable('Cancel selection')[0]:
-                        self.reset_selected()
-                imgui.end_popup()
-        return context_menu
+            imgui.invisible_button('##hsplitter', -1, 8)
 
     def display_table(self):
         imgui.columns(2)
         imgui.set_column_width(0, self.width_lineno)
 
-        for i, row in enumerate(self.rows):
-            imgui.text(str(self.snippet.line_start + i))
-            imgui.next_column()
-            self.handle_selectable_row(i, row)
-            imgui.next_column()
+        # NOTE: This loop runs for every visible row in every frame, so functions
+        # and attributes used in it are bound to local variables in advance.
+        text, next_column, selectable = imgui.text, imgui.next_column, imgui.selectable
+        push_style_color, pop_style_color = imgui.push_style_color, imgui.pop_style_color
+        color_header = _COLOR_HEADER
+        key_shift = imgui.get_io().key_shift
+        line_numbers = self.get_line_numbers()
+        rows = self.rows
+
+        if self.selected_mask == 0 and self._ref_range is None:
+            # Fast path for the common case: nothing is selected or highlighted,
+            # so rows can be rendered without checking their states. A click
+            # selects a single row only, rows after it are still unselected.
+            for i in _iter_visible_rows(len(rows)):
+                text(line_numbers[i])
+                next_column()
+                if selectable(rows[i])[0]:
+                    self.handle_selectable_row(i, key_shift)
+                next_column()
+            return
+
+        ref_start, ref_stop = self._ref_range or (0, 0)
+        # Selected rows are always contiguous, see also `self.select_rows()`
+        sel_first, sel_last = self._first_selected_idx, self._last_selected_idx
+
+        for i in _iter_visible_rows(len(rows)):
+            row = rows[i]
+            text(line_numbers[i])
+            next_column()
+            if ref_start <= i+1 < ref_stop:
+                # Highlight lines referenced by selected leaf node
+                push_style_color(color_header, 0.5, 0.8, 0.5, 0.4)
+                clicked, _ = selectable(row, selected=True)
+                pop_style_color()
+            else:
+                clicked, _ = selectable(row, selected=sel_first <= i <= sel_last)
+            if clicked:
+                self.handle_selectable_row(i, key_shift)
+                sel_first, sel_last = self._first_selected_idx, self._last_selected_idx
+            next_column()
 
     def display_comment_window(self):
         imgui.push_item_width(-1)
@@ -402,10 +475,48 @@ class CodeSnippetWindow(ImguiComponent):
             self.node.comment = text
         imgui.pop_item_width()
 
+    def _render_context_menu(self):
+        if not imgui.begin_popup_context_item('context-menu', mouse_button=2):
+            return
+
+        # Show property window
+        if imgui.selectable('Properties')[0]:
+            if self.property_window is None:
+                self.property_window = CodeSnippetPropertyWindow(
+                    self.snippet, self.node.uuid,
+                    initial_position=Vec2(*imgui.get_mouse_pos())
+                )
+                self.property_window.window_opened = True
+
+        # Prepare to enter edit mode
+        if imgui.selectable('Edit')[0]:
+            self.is_edit_mode = True
+            self.edited_content = self.node.snippet.content
+
+        # Clear highlighted lines
+        if self.reference_info is not None and imgui.selectable('Clear highlight')[0]:
+            self.reference_info = None
+
+        # Add the following menu items only when lines are selected
+        if self.selected_mask != 0:
+            imgui.separator()
+            if imgui.selectable('Add leaf reference')[0]:
+                ref_start, ref_stop = self.get_selected_lines()
+                event_args = dict(
+                    root_node=self.node,
+                    ref_start=ref_start,
+                    ref_stop=ref_stop,
+                )
+                event = NodeEvent(f'add_reference_##{self.container_id}', event_args)
+                self.event_registry.dispatch(event)
+            if imgui.selectable('Cancel selection')[0]:
+                self.reset_selected()
+        imgui.end_popup()
+
     def _render_view_mode(self):
         # Make the height of the following windows adjustable
         # ref: https://github.com/ocornut/imgui/issues/125#issuecomment-135775009
-        imgui.push_style_var(imgui.STYLE_ITEM_SPACING, imgui.Vec2(0, 0))
+        imgui.push_style_var(_STYLE_ITEM_SPACING, _VEC2_ZERO)
 
         # Table for code snippet
         if self.collapsing_header_expanded:
@@ -416,22 +527,20 @@ class CodeSnippetWindow(ImguiComponent):
         imgui.set_next_window_content_size(self.width_code, self._snippet_height)
         imgui.begin_child(
             'code-snippet', -5, h_snippet, border=True,
-            flags=imgui.WINDOW_HORIZONTAL_SCROLLING_BAR
+            flags=_WINDOW_HORIZONTAL_SCROLLING_BAR
         )
         self.display_table()
         imgui.end_child()
 
         # Context menu
         # NOTE: This should be invoked right after the end of displaying table.
-        context_menu = self.create_context_menu()
-        is_any_row_selected = any(self.selected)
-        context_menu(is_any_row_selected)
+        self._render_context_menu()
 
         # Horizontal splitter
         self.handle_hsplitter()
 
         # Comment window
-        imgui.begin_child('comment', 0, 0, border=False, flags=imgui.WINDOW_NO_SCROLLBAR)
+        imgui.begin_child('comment', 0, 0, border=False, flags=_WINDOW_NO_SCROLLBAR)
         self.collapsing_header_expanded, visible = imgui.collapsing_header('Comment')
         if self.collapsing_header_expanded:
             self.display_comment_window()
@@ -455,38 +564,48 @@ class CodeSnippetWindow(ImguiComponent):
 
         # Buttons
         imgui.begin_group()
-        pos = Vec2(*imgui.get_cursor_position())
+        cx, cy = imgui.get_cursor_position()
         width = imgui.get_window_content_region_width()
-        imgui.set_cursor_pos(Vec2(pos.x + width - 92, pos.y))
+        imgui.set_cursor_pos((cx + width - 92, cy))
         is_btn_save_clicked = imgui.button('Save')
         imgui.same_line()
         is_btn_cancel_clicked = imgui.button('Cancel')
         imgui.end_group()
 
+        # NOTE: `self.edited_content` is not cleared here, it will be replaced
+        # when entering edit mode next time.
         if is_btn_save_clicked:
             self.is_edit_mode = False
-            self.node.snippet.content = self.edited_content
-            self.rows = self.node.snippet.content.splitlines()
-            self.selected = [False] * len(self.rows)
-            self.edited_content = ''
-            self.calculate_window_size()
+            if self.convert_tab_to_spaces:
+                # Convert remaining tabs in a single pass over the text, so
+                # saved content doesn't rely on the input callback only.
+                self.edited_content = self.edited_content.replace(
+                    '\t', ' ' * self.tab_to_spaces_number
+                )
+            # Rows are rebuilt only when content is actually changed
+            if self.edited_content != self.node.snippet.content:
+                self.node.snippet.content = self.edited_content
+                self.rows, self._max_row_length = _get_snippet_rows(self.node)
+                self.reset_selected()
+                self.calculate_window_size()
         elif is_btn_cancel_clicked:
             self.is_edit_mode = False
-            self.edited_content = ''
 
     def render(self):
         if not self.window_opened:
             return
-        _, self.window_opened = imgui.begin(self.window_name, closable=True, flags=imgui.WINDOW_NO_SCROLLBAR)
+        expanded, self.window_opened = imgui.begin(self.window_name, closable=True, flags=_WINDOW_NO_SCROLLBAR)
         if not self.window_opened:
             imgui.end()
             return
         imgui.set_window_size(self.width, self.height)
 
-        if self.is_edit_mode:
-            self._render_edit_mode()
-        else:
-            self._render_view_mode()
+        # Contents are invisible when window is collapsed
+        if expanded:
+            if self.is_edit_mode:
+                self._render_edit_mode()
+            else:
+                self._render_view_mode()
 
         if self.property_window is not None:
             if self.property_window.window_opened:
@@ -559,66 +678,58 @@ class CodeSnippetPropertyWindow(ImguiComponent):
 
     def _render_property_fields(self):
         imgui.begin_child('inputs', 0, -25)
+        imgui.push_item_width(-1)
         imgui.text('Snippet name:')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##snippet-name', self.input_snippet_name, self.INPUT_SNIPPET_NAME_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_name = text
 
         imgui.text('Language:')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##language', self.input_snippet_lang, self.INPUT_LANGUAGE_NAME_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_lang = text
 
         imgui.text('Path:')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##path', self.input_snippet_path, self.INPUT_SNIPPET_PATH_MAX_LENGTH
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_path = text
 
         imgui.text('URL:')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##url', self.input_snippet_url, self.INPUT_SNIPPET_URL_MAX_LENGTH
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_url = text
 
         imgui.text('Location of first line:')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##start-line', self.input_start_line, self.INPUT_START_LINE_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_start_line = text
 
+        imgui.pop_item_width()
         imgui.end_child()
 
         # Buttons
         imgui.begin_group()
-        pos = Vec2(*imgui.get_cursor_position())
+        cx, cy = imgui.get_cursor_position()
         width = imgui.get_window_content_region_width()
-        imgui.set_cursor_pos(Vec2(pos.x + width - 95, pos.y))
+        imgui.set_cursor_pos((cx + width - 95, cy))
         is_btn_save_clicked = imgui.button('Save')
         imgui.same_line()
         is_btn_cancel_clicked = imgui.button('Cancel')
@@ -654,7 +765,9 @@ class CodeSnippetPropertyWindow(ImguiComponent):
 
 
 NODE_SLOT_RADIUS = 4.0
+NODE_SLOT_NUM_SEGMENTS = 8  # a slot is small, so that fewer segments is enough to be round
 NODE_WINDOW_PADDING = Vec2(8.0, 8.0)
+NODE_WINDOW_PADDING_2X = 2 * NODE_WINDOW_PADDING
 NODE_MAX_NAME_LEGNTH = 8    # number of characters
 
 class CodeNodeComponent(ImguiComponent):
@@ -670,6 +783,13 @@ class CodeNodeComponent(ImguiComponent):
         'root': (0.3, 0.6, 0.3, 1),
         'normal': (0.25, 0.25, 0.25, 1),
     }
+    # NOTE: Instances of this class are iterated by `CodeNodeViewer` several
+    # times per frame, use fixed slots to keep them compact.
+    __slots__ = (
+        'id', 'id_str', 'pos', 'size', 'node', 'snippet_window', '_snippet_window_init_kwargs',
+        '_max_name_length', 'container', '_is_showing_context_menu', 'confirmation_modal',
+        '_display_name_src', '_display_name', 'is_size_measured',
+    )
 
     def __init__(self, app, _id, pos, node, **kwargs):
         """
@@ -686,8 +806,10 @@ class CodeNodeComponent(ImguiComponent):
             for this node.
         """
         self.id = _id
+        self.id_str = str(_id)  # for `imgui.push_id()`, which accepts only string
         self.pos = pos
         self.size = Vec2(60, 13)    # just an initial value, should be set after rendered
+        self.is_size_measured = False
         self.node = node
 
         self.snippet_window = None
@@ -699,22 +821,42 @@ class CodeNodeComponent(ImguiComponent):
         self._max_name_length = getattr(
             app.config.viewer, 'node_max_name_length', NODE_MAX_NAME_LEGNTH
         )
+        # Cache of truncated name, see also `self.display_name`
+        self._display_name_src = None
+        self._display_name = ''
 
         self.container = None
-        self.is_showing_context_menu = False
+        self._is_showing_context_menu = False
         self.confirmation_modal = False
 
     @property
     def name(self):
         return self.node.snippet.name
 
+    @property
+    def is_showing_context_menu(self):
+        return self._is_showing_context_menu
+
+    @is_showing_context_menu.setter
+    def is_showing_context_menu(self, value):
+        # Let container know how many context menus of nodes are showing, so
+        # that it doesn't have to check all nodes every frame.
+        if value != self._is_showing_context_menu and self.container is not None:
+            self.container._n_context_menus_showing += 1 if value else -1
+        self._is_showing_context_menu = value
+
     @property
     def display_name(self):
-        """Name of node to display on canvas."""
-        if len(self.name) > self._max_name_length:
-            return f'{self.name[:self._max_name_length - 3]}...'
-        else:
-            return self.name
+        """Name of node to display on canvas. It's truncated only when name
+        of snippet is changed (compared by identity)."""
+        name = self.node.snippet.name
+        if name is not self._display_name_src:
+            self._display_name_src = name
+            if len(name) > self._max_name_length:
+                self._display_name = f'{name[:self._max_name_length - 3]}...'
+            else:
+                self._display_name = name
+        return self._display_name
 
     def get_leaf_slot_pos(self, slot_no):
         y = self.pos.y + self.size.y * (slot_no + 1) / (len(self.node.leaves) + 1)
@@ -730,11 +872,15 @@ class CodeNodeComponent(ImguiComponent):
         self.container = container
 
     def open_snippet_window(self):
+        active_windows = self.container._active_snippet_windows
+        if self.snippet_window in active_windows:
+            active_windows.remove(self.snippet_window)
         self.snippet_window = CodeSnippetWindow(
             self.node, self.container.window_id, **self._snippet_window_init_kwargs
         )
         self.snippet_window.window_opened = True
-        imgui.set_next_window_focus()
+        self.snippet_window.focus_on_next_render = True
+        active_windows.append(self.snippet_window)
 
     def process_interaction(self):
         interaction_name = ''
@@ -771,32 +917,20 @@ class CodeNodeComponent(ImguiComponent):
             callback_yes=lambda: self.container.remove_root_reference(target, root),
         )
 
-    def render(self, draw_list, offset):
+    def render_background(self, draw_list, offset):
+        """Render node box and handle interactions with it. Size of the box
+        is the one measured by `self.render_foreground()` in the last frame."""
         assert isinstance(self.container, CodeNodeViewer), (
             f'require a container {CodeNodeViewer} to render, got {self.container}'
         )
 
-        node_rect_min = Vec2(*(offset + self.pos))
-
-        # Display node contents first
-        draw_list.channels_set_current(1)   # foreground
-        old_any_active = imgui.is_any_item_active()
-        imgui.set_cursor_screen_pos(node_rect_min + NODE_WINDOW_PADDING)
-        imgui.begin_group()
-        imgui.text(f'{self.display_name}')
-        imgui.end_group()
-
-        # Save the size
-        self.size = Vec2(*imgui.get_item_rect_size()) + 2 * NODE_WINDOW_PADDING
-        node_rect_max = node_rect_min + self.size
-
         # Display node box
-        draw_list.channels_set_current(0)
-        imgui.set_cursor_screen_pos(node_rect_min)
+        old_any_active = imgui.is_any_item_active()
+        imgui.set_cursor_screen_pos(offset + self.pos)
         imgui.invisible_button('node', *self.size)
 
         # Display CodeSnippetWindow
-        if imgui.is_item_hovered():
+        if self.container.id_hovered_in_scene == self.id:
             # Show full name in tooltip if length of name is too long
             if len(self.name) > self._max_name_length:
                 imgui.set_tooltip(self.name)
@@ -807,13 +941,6 @@ class CodeNodeComponent(ImguiComponent):
             ):
                 self.open_snippet_window()
 
-        if self.snippet_window is not None:
-            if self.snippet_window.window_opened:
-                self.snippet_window.render()
-            else:
-                # Window has been closed, so we remove this reference.
-                self.snippet_window = None
-
         # TODO: for context menu
         self.container.handle_active_node(self, old_any_active)
 
@@ -821,17 +948,17 @@ class CodeNodeComponent(ImguiComponent):
         bg_state = 'normal'
         if self.container.check_node_activated(self):
             bg_state = 'activated'
-        elif self.container.selected_node is not None:
-            if self.node in self.container.selected_node.node.roots:
-                bg_state = 'root'
-        bg_color_tuple = self.NODE_BG_COLOR_MAP.get(bg_state, 'normal')
-        node_bg_color = imgui.get_color_u32_rgba(*bg_color_tuple)
+        elif id(self.node) in self.container._selected_root_ids:
+            bg_state = 'root'
+        node_bg_color = self.container._node_bg_colors[bg_state]
 
         # Set foreground color
         interaction_name = self.process_interaction()
-        fg_color_tuple = self.NODE_FG_COLOR_MAP.get(interaction_name, '')
-        node_fg_color = imgui.get_color_u32_rgba(*fg_color_tuple)
+        node_fg_color = self.container._node_fg_colors[interaction_name]
 
+        # Position might be changed by dragging, so it's resolved here
+        node_rect_min = offset + self.pos
+        node_rect_max = node_rect_min + self.size
         draw_list.add_rect_filled(*node_rect_min, *node_rect_max, node_bg_color, 4.0)
         draw_list.add_rect(*node_rect_min, *node_rect_max, node_fg_color, 4.0)
 
@@ -852,6 +979,26 @@ class CodeNodeComponent(ImguiComponent):
                 )
             imgui.end_popup()
 
+        self.render_windows()
+
+    def render_foreground(self, draw_list, offset):
+        """Render node contents and save the size of them."""
+        imgui.set_cursor_screen_pos(offset + self.pos + NODE_WINDOW_PADDING)
+        imgui.begin_group()
+        imgui.text(self.display_name)
+        imgui.end_group()
+
+        # Save the size
+        size = Vec2(*imgui.get_item_rect_size()) + NODE_WINDOW_PADDING_2X
+        self.is_size_measured = True
+        if size != self.size:
+            self.size = size
+            self.container.invalidate_scene_cache()
+
+    def render_windows(self):
+        """Render modal opened by this node. It's not part of the canvas, so it
+        should be rendered even if this node is out of view. (Snippet windows
+        are rendered by container, see `CodeNodeViewer.render_snippet_windows()`)"""
         if self.confirmation_modal:
             self.confirmation_modal.render()
             if self.confirmation_modal.terminated:
@@ -866,12 +1013,13 @@ class CodeNodeCreatorWindow(ImguiComponent):
     INPUT_SNIPPET_URL_MAX_LENGTH = 2048
     INPUT_SNIPPET_CONTENT_MAX_LENGTH = 65536
     INPUT_START_LINE_MAX_LENGTH = 16
+    _window_id_counter = itertools.count(1)
 
     def __init__(self, app, creation_pos=None, **kwargs):
         self.app = app
         self.creation_pos = creation_pos
         self.container = None
-        self.window_id = int(time.time())
+        self.window_id = next(CodeNodeCreatorWindow._window_id_counter)
         self.event_registry = NodeEventRegistry.get_instance()
 
         self.input_snippet_name = 'untitled'
@@ -925,8 +1073,13 @@ class CodeNodeCreatorWindow(ImguiComponent):
             GlobalState().push_error(ValueError(error_msg))
             return
 
+        content = self.input_snippet
+        if self.convert_tab_to_spaces:
+            # Convert tabs in pasted text, see also `CodeSnippetWindow._render_edit_mode()`
+            content = content.replace('\t', ' ' * self.tab_to_spaces_number)
+
         snippet = Snippet(
-            self.input_snippet_name, self.input_snippet,
+            self.input_snippet_name, content,
             line_start=start_line, lang=self.input_snippet_lang,
             path=self.input_snippet_path,
             url=self.input_snippet_url,
@@ -949,13 +1102,11 @@ class CodeNodeCreatorWindow(ImguiComponent):
             imgui.end_popup()
 
     def _check_input_number(self, value):
-        try:
-            int(value)
-        except ValueError:
-            return False
+        # Line number is always positive, so checking digits is enough here and
+        # it's cheaper than catching the exception raised by `int()`.
         if len(value) > self.INPUT_START_LINE_MAX_LENGTH:
             return False
-        return True
+        return value.isdecimal()
 
     def render(self):
         if self.container.terminated:
@@ -966,16 +1117,15 @@ class CodeNodeCreatorWindow(ImguiComponent):
 
         # Inputs
         imgui.begin_child('inputs', 0, -25)
+        imgui.push_item_width(-1)
         imgui.text('Snippet name:')
         if imgui.is_item_hovered():
             imgui.set_tooltip('[Required] Name of this code snippet')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##snippet-name', self.input_snippet_name, self.INPUT_SNIPPET_NAME_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_name = text
 
@@ -983,12 +1133,10 @@ class CodeNodeCreatorWindow(ImguiComponent):
         if imgui.is_item_hovered():
             imgui.set_tooltip('Language of this code snippet')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##language', self.input_snippet_lang, self.INPUT_LANGUAGE_NAME_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_lang = text
 
@@ -996,11 +1144,9 @@ class CodeNodeCreatorWindow(ImguiComponent):
         if imgui.is_item_hovered():
             imgui.set_tooltip('Path of file where this code snippet locates')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##path', self.input_snippet_path, self.INPUT_SNIPPET_PATH_MAX_LENGTH
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_path = text
 
@@ -1008,11 +1154,9 @@ class CodeNodeCreatorWindow(ImguiComponent):
         if imgui.is_item_hovered():
             imgui.set_tooltip('URL of file where this code snippet locates')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##url', self.input_snippet_url, self.INPUT_SNIPPET_URL_MAX_LENGTH
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet_url = text
 
@@ -1020,31 +1164,28 @@ class CodeNodeCreatorWindow(ImguiComponent):
         if imgui.is_item_hovered():
             imgui.set_tooltip('A line number of the first line where this code snippet refering')
         imgui.same_line()
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text(
             '##start-line', self.input_start_line, self.INPUT_START_LINE_MAX_LENGTH,
             flags=imgui.INPUT_TEXT_CHARS_NO_BLANK
         )
-        imgui.pop_item_width()
         if changed:
             self.input_start_line = text
 
         imgui.text('Snippet:')
-        imgui.push_item_width(-1)
         changed, text = imgui.input_text_multiline(
             '##snippet', self.input_snippet, self.INPUT_SNIPPET_CONTENT_MAX_LENGTH, height=-5,
             flags=self.input_text_callback_flags, callback_config=self.input_text_callback_config
         )
-        imgui.pop_item_width()
         if changed:
             self.input_snippet = text
+        imgui.pop_item_width()
         imgui.end_child()
 
         # Buttons
         imgui.begin_group()
-        pos = Vec2(*imgui.get_cursor_position())
+        cx, cy = imgui.get_cursor_position()
         width = imgui.get_window_content_region_width()
-        imgui.set_cursor_pos(Vec2(pos.x + width - 107, pos.y))
+        imgui.set_cursor_pos((cx + width - 107, cy))
         is_btn_create_clicked = imgui.button('Create')
         imgui.same_line()
         is_btn_cancel_clicked = imgui.button('Cancel')
@@ -1058,6 +1199,79 @@ class CodeNodeCreatorWindow(ImguiComponent):
         imgui.end()
 
 
+def _compute_layout_positions(layer_sizes, n_orphans, ux, uy):
+    """Compute positions of nodes for the layout of trees.
+
+    Trees are placed from top to bottom, and layers of a tree are placed from
+    left to right. Orphan nodes are placed in the first column.
+
+    Parameters
+    ----------
+    layer_sizes : list of list of int
+        Number of nodes in each layer of each tree.
+    n_orphans : int
+        Number of orphan nodes.
+    ux, uy : float
+        Horizontal and vertical offset between nodes.
+
+    Returns
+    -------
+    positions : list of tuple
+        Positions `(x, y)` of nodes, ordered as nodes in trees (layer by layer)
+        followed by orphan nodes.
+    """
+    positions = []
+    x_offset = ux if n_orphans != 0 else 0
+    y_offset = 0
+    for sizes in layer_sizes:
+        for i, size in enumerate(sizes):
+            x = i*ux + x_offset
+            positions.extend([(x, j*uy + y_offset) for j in range(size)])
+        # update `y_offset` for next tree (width of tree: size of the largest layer)
+        y_offset += max(sizes) * uy
+    positions.extend([(0, i*uy) for i in range(n_orphans)])
+    return positions
+
+
+class _NodeSpatialHash(object):
+    """A uniform grid over bounding boxes of nodes on canvas.
+
+    It's used to find nodes at a point or in a region without testing all
+    nodes. Indices of nodes in each cell are kept in ascending order, so that
+    the drawing order of nodes is preserved.
+    """
+    __slots__ = ('cell_size', 'cells')
+
+    def __init__(self, node_components, cell_size=256.0):
+        self.cell_size = cell_size
+        self.cells = {}
+        for i, node in enumerate(node_components):
+            pos, size = node.pos, node.size
+            for cell in self._iter_cells(pos.x, pos.y, pos.x + size.x, pos.y + size.y):
+                self.cells.setdefault(cell, []).append(i)
+
+    def _iter_cells(self, x_min, y_min, x_max, y_max):
+        cs = self.cell_size
+        ys = range(math.floor(y_min / cs), math.floor(y_max / cs) + 1)
+        for cx in range(math.floor(x_min / cs), math.floor(x_max / cs) + 1):
+            for cy in ys:
+                yield (cx, cy)
+
+    def query_point(self, x, y):
+        """Get indices of nodes which might contain the given point."""
+        cs = self.cell_size
+        return self.cells.get((math.floor(x / cs), math.floor(y / cs)), [])
+
+    def intersection(self, x_min, y_min, x_max, y_max):
+        """Get indices of nodes which might overlap with the given region."""
+        result = set()
+        cells = self.cells
+        for cell in self._iter_cells(x_min, y_min, x_max, y_max):
+            if cell in cells:
+                result.update(cells[cell])
+        return result
+
+
 class CodeNodeViewer(ImguiComponent):
     """ A viewer for CodeNodeComponent.
     reference: https://gist.github.com/ocornut/7e9b3ec566a333d725d4
@@ -1065,8 +1279,12 @@ class CodeNodeViewer(ImguiComponent):
     DEFAULT_NODE_LIST_WIDTH = 100.0
     SEARCH_TEXT_MAX_LENGTH = 128
     DEFAULT_NODE_OFFSET_Y = 80
+    GRID_COLOR_TUPLE = (0.8, 0.8, 0.8, 0.15)
     NODE_LINK_COLOR_TUPLE = (1, 1, 0, 1)
     NODE_SLOT_COLOR_TUPLE = (0.75, 0.75, 0.75, 1)
+    MSG_ADD_REFERENCE_COLOR_TUPLE = (1, 1, 0, 1)
+    MSG_REMOVE_ROOT_REFERENCE_COLOR_TUPLE = (1, 0, 0, 1)
+    _window_id_counter = itertools.count(1)
 
     def __init__(self, app, node_collection, fn_src=None):
         """
@@ -1083,22 +1301,37 @@ class CodeNodeViewer(ImguiComponent):
         self.fn_src = fn_src
         self.terminated = False
 
-        # NOTE: Here we use timestamp as an identifier to prevent data being
-        # rendering in the same window if there are multiple viewer windows
-        # haven't saved changes.
-        self.window_id = int(time.time())
+        # NOTE: Here we use an unique number as an identifier to prevent data
+        # being rendering in the same window if there are multiple viewer windows
+        # haven't saved changes. (Timestamp was used before, but it collides
+        # when multiple viewers are opened within one second.)
+        self.window_id = next(CodeNodeViewer._window_id_counter)
         fn = 'untitled' if fn_src is None else Path(fn_src).with_suffix('').name
         self.window_name = f'CodeNode Viewer: {fn} ###{self.window_id}'
 
         self.node_collection = node_collection
+        # Snapshot of data in `fn_src` to check unsaved changes on closing, so
+        # that we don't have to load that file again.
+        self._saved_data = None if fn_src is None else node_collection.to_dict()
         self.node_components = []
         self.filtered_node_components = []
+        # Map from `id(node)` to the component containing it
+        self._node_to_component = {}
+        self._spatial_index = None
+        # Geometry and draw commands of links built in the last frame, see
+        # `self.display_links()`
+        self._link_geometry = None
+        self._link_draw_cache = None
         self.links = []
         self.id_selected = -1
+        # IDs of root nodes of the selected node, see `self.display_nodes()`
+        self._selected_root_ids = frozenset()
         self.id_hovered_in_list = -1
         self.id_hovered_in_scene = -1
         self.selected_node = None
         self.panning = Vec2(0.0, 0.0)
+        # Label of panning offset, it's formatted only when panning is changed
+        self._panning_label = (None, '')
 
         # NOTE: We should keep node id be auto incremental to prevent dupliate
         # id being used by newly created node.
@@ -1123,6 +1356,17 @@ class CodeNodeViewer(ImguiComponent):
             self.app.config.viewer, 'layout_node_offset_y', self.DEFAULT_NODE_OFFSET_Y
         )
 
+        # Settings for text input of nodes. Config won't be changed while this
+        # viewer is running, so that we can just prepare it once.
+        self._node_init_kwargs = {
+            'convert_tab_to_spaces': self.app.config.text_input.convert_tab_to_spaces,
+            'tab_to_spaces_number': self.app.config.text_input.tab_to_spaces_number,
+        }
+
+        # Colors for drawing (packed in u32). They are resolved lazily on the
+        # first frame of canvas, see also `self._refresh_colors()`.
+        self._colors_ready = False
+
         # --- Flags for view control
         # Show grid
         self.show_grid = False
@@ -1137,6 +1381,12 @@ class CodeNodeViewer(ImguiComponent):
         self.prev_vsplitter_dragging_delta_x = 0.0
         self.opened = False
         self.state_cache = {}
+        # Number of nodes showing their context menu, it's maintained by
+        # `CodeNodeComponent.is_showing_context_menu`.
+        self._n_context_menus_showing = 0
+        # Snippet windows opened by nodes. They are rendered from here, so that
+        # we don't have to check every node for opened window in every frame.
+        self._active_snippet_windows = []
 
         self.search_text = ''
         self.is_in_search_mode = False
@@ -1147,18 +1397,13 @@ class CodeNodeViewer(ImguiComponent):
         # also be created in all other windows since they all registered the event
         # with the same event name.)
         self.event_registry = NodeEventRegistry.get_instance()
-        self.event_registry.register(
-            f'add_reference_##{self.window_id}',
-            self.handle_event__add_reference
-        )
-        self.event_registry.register(
-            f'remove_root_reference_##{self.window_id}',
-            self.handle_event__remove_root_reference
-        )
-        self.event_registry.register(
-            f'create_node_##{self.window_id}',
-            self.handle_event__create_node
-        )
+        self._event_handlers = [
+            (f'add_reference_##{self.window_id}', self.handle_event__add_reference),
+            (f'remove_root_reference_##{self.window_id}', self.handle_event__remove_root_reference),
+            (f'create_node_##{self.window_id}', self.handle_event__create_node),
+        ]
+        for event_name, handler in self._event_handlers:
+            self.event_registry.register(event_name, handler)
 
         # TODO: This is currently a workaround to handle local shortcuts for those
         # widgets that may exist multiple instances simultaneously. This approach
@@ -1170,6 +1415,24 @@ class CodeNodeViewer(ImguiComponent):
 
         self.init_nodes_and_links()
 
+    def _refresh_colors(self):
+        """Convert colors used for drawing canvas to packed u32 values. They are
+        cached because they won't change unless style of imgui is changed, and
+        this should be called again in that case."""
+        self._colors_ready = True
+        to_u32 = imgui.get_color_u32_rgba
+        self._grid_color = to_u32(*self.GRID_COLOR_TUPLE)
+        self._link_color = to_u32(*self.NODE_LINK_COLOR_TUPLE)
+        self._slot_color = to_u32(*self.NODE_SLOT_COLOR_TUPLE)
+        self._msg_add_reference_color = to_u32(*self.MSG_ADD_REFERENCE_COLOR_TUPLE)
+        self._msg_remove_root_reference_color = to_u32(*self.MSG_REMOVE_ROOT_REFERENCE_COLOR_TUPLE)
+        self._node_bg_colors = {
+            k: to_u32(*v) for k, v in CodeNodeComponent.NODE_BG_COLOR_MAP.items()
+        }
+        self._node_fg_colors = {
+            k: to_u32(*v) for k, v in CodeNodeComponent.NODE_FG_COLOR_MAP.items()
+        }
+
     @classmethod
     def load(self, app, fn):
         node_collection = NodeCollection.load(fn)
@@ -1177,6 +1440,7 @@ class CodeNodeViewer(ImguiComponent):
 
     def save_data(self, fn):
         self.node_collection.save(fn)
+        self._saved_data = self.node_collection.to_dict()
 
         # Update window name
         self.fn_src = fn
@@ -1201,34 +1465,25 @@ class CodeNodeViewer(ImguiComponent):
         self.links = self.node_collection.resolve_links_from_trees(trees)
 
         # Calculate position according to tree
-        positions = []
-        ux, uy = self._layout_node_offset_x, self._layout_node_offset_y
-        x_offset = ux if len(orphans) != 0 else 0
-        y_offset = 0
-        tree_widths = [max([len(layer) for layer in tree]) for tree in trees]
-        for n, tree in enumerate(trees):
-            for i, layer in enumerate(tree):
-                for j, node in enumerate(layer):
-                    positions.append(Vec2(i*ux + x_offset, j*uy + y_offset))
-            # update `y_offset` for next tree
-            y_offset += tree_widths[n] * uy
-        for i, v in enumerate(orphans):
-            positions.append(Vec2(0, i*uy))
+        layer_sizes = [[len(layer) for layer in tree] for tree in trees]
+        positions = [
+            Vec2(x, y) for x, y in _compute_layout_positions(
+                layer_sizes, len(orphans),
+                self._layout_node_offset_x, self._layout_node_offset_y
+            )
+        ]
 
         # Create ordered list of node according to tree
         nodes = []
         for tree in trees:
-            nodes.extend([v for layer in tree for v in layer])
+            for layer in tree:
+                nodes.extend(layer)
         nodes.extend(orphans)
 
         if len(self.node_components) == 0:
             # Instantiate `CodeNodeComponent`s with calculated positions
-            init_kwargs = {
-                'convert_tab_to_spaces': self.app.config.text_input.convert_tab_to_spaces,
-                'tab_to_spaces_number': self.app.config.text_input.tab_to_spaces_number,
-            }
             self.node_components = [
-                CodeNodeComponent(self.app, i, positions[i], v, **init_kwargs)
+                CodeNodeComponent(self.app, i, positions[i], v, **self._node_init_kwargs)
                 for i, v in enumerate(nodes)
             ]
             # Set container (viewer) for nodes
@@ -1236,19 +1491,36 @@ class CodeNodeViewer(ImguiComponent):
                 node.set_container(self)
         else:
             # Update position instead if `CodeNodeComponent`s are already created
+            node_positions = {id(v): pos for v, pos in zip(nodes, positions)}
             for component in self.node_components:
-                idx = nodes.index(component.node)
-                component.pos = positions[idx]
+                component.pos = node_positions[id(component.node)]
+        self._node_to_component = {id(v.node): v for v in self.node_components}
+        self.invalidate_scene_cache()
+
+    @property
+    def spatial_index(self):
+        """Spatial index over nodes on canvas, it's rebuilt lazily after nodes
+        are added, removed, moved or resized."""
+        if self._spatial_index is None:
+            self._spatial_index = _NodeSpatialHash(self.node_components)
+        return self._spatial_index
+
+    def invalidate_scene_cache(self):
+        """Mark data derived from positions and sizes of nodes as dirty. It
+        should be called after nodes are added, removed, moved or resized."""
+        self._spatial_index = None
+        self._link_geometry = None
+        self._link_draw_cache = None
 
     def reset_hovered_id_cache(self):
         self.id_hovered_in_list = -1
         self.id_hovered_in_scene = -1
 
     def reset_dragging_delta(self):
-        self.prev_dragging_delta = Vec2(0.0, 0.0)
+        self.prev_dragging_delta = _VEC2_ZERO
 
     def reset_panning_delta(self):
-        self.prev_panning_delta =  Vec2(0.0, 0.0)
+        self.prev_panning_delta = _VEC2_ZERO
 
     def check_node_activated(self, node):
         return (
@@ -1260,24 +1532,31 @@ class CodeNodeViewer(ImguiComponent):
     def create_node_component(self, node, node_pos=None):
         self.node_collection.nodes.append(node)
 
-        init_kwargs = {
-            'convert_tab_to_spaces': self.app.config.text_input.convert_tab_to_spaces,
-            'tab_to_spaces_number': self.app.config.text_input.tab_to_spaces_number,
-        }
-
         index = self._id_auto_increment
         self._id_auto_increment += 1
 
-        component = CodeNodeComponent(self.app, index, node_pos, node, **init_kwargs)
+        component = CodeNodeComponent(self.app, index, node_pos, node, **self._node_init_kwargs)
         component.set_container(self)
         self.node_components.append(component)
+        self._node_to_component[id(node)] = component
+        self.invalidate_scene_cache()
+
+    def _pop_node_component(self, idx):
+        component = self.node_components.pop(idx)
+        self._node_to_component.pop(id(component.node), None)
+        if component.snippet_window in self._active_snippet_windows:
+            self._active_snippet_windows.remove(component.snippet_window)
+        self.invalidate_scene_cache()
+        # Keep the counter of showing context menus consistent
+        component.is_showing_context_menu = False
+        return component
 
     def remove_node_component(self, node_component):
         try:
             self.node_collection.remove_node(node_component.node)
             idx = self.node_components.index(node_component)
             node_component_id = node_component.id
-            self.node_components.pop(idx)
+            self._pop_node_component(idx)
             self.links = self.node_collection.resolve_links()
             if self.id_selected == node_component_id:
                 self.id_selected = -1   # reset index of selected node
@@ -1289,7 +1568,7 @@ class CodeNodeViewer(ImguiComponent):
 
                 for node in removed:
                     idx = uuids.index(node.uuid)
-                    self.node_components.pop(idx)
+                    self._pop_node_component(idx)
                     uuids.pop(idx)
 
                 self.links = self.node_collection.resolve_links()
@@ -1301,7 +1580,7 @@ class CodeNodeViewer(ImguiComponent):
                 self.node_collection.remove_node(node_component.node)
 
                 idx = self.node_components.index(node_component)
-                self.node_components.pop(idx)
+                self._pop_node_component(idx)
 
                 self.links = self.node_collection.resolve_links()
                 if self.id_selected == node_component.id:
@@ -1322,15 +1601,18 @@ class CodeNodeViewer(ImguiComponent):
             GlobalState().push_error(ex)
 
     def init_canvas(self):
-        imgui.text(f'Offset to origin: ({self.panning.x}, {self.panning.y})  ')
+        panning = self.panning
+        if panning != self._panning_label[0]:
+            self._panning_label = (panning, f'Offset to origin: ({panning.x}, {panning.y})  ')
+        imgui.text(self._panning_label[1])
         imgui.same_line()
         imgui.text('(?)')
         if imgui.is_item_hovered():
             imgui.set_tooltip('Hold middle mouse button to pan canvas')
-        imgui.push_style_var(imgui.STYLE_FRAME_PADDING, Vec2(1, 1))
-        imgui.push_style_var(imgui.STYLE_WINDOW_PADDING, Vec2(0, 0))
+        imgui.push_style_var(imgui.STYLE_FRAME_PADDING, _VEC2_ONE)
+        imgui.push_style_var(imgui.STYLE_WINDOW_PADDING, _VEC2_ZERO)
         imgui.push_style_color(imgui.COLOR_CHILD_BACKGROUND, *(0.05, 0.1, 0.15))
-        imgui.begin_child('panning_region', 0, 0, flags=imgui.WINDOW_NO_SCROLLBAR | imgui.WINDOW_NO_MOVE)
+        imgui.begin_child('panning_region', 0, 0, flags=_CANVAS_WINDOW_FLAGS)
         imgui.pop_style_var()
         imgui.pop_style_var()
         imgui.pop_style_color()
@@ -1414,23 +1696,52 @@ class CodeNodeViewer(ImguiComponent):
     def handle_active_node(self, node_component, old_any_active):
         node_widgets_active = (not old_any_active) and imgui.is_any_item_active()
 
-        if imgui.is_item_hovered():
-            self.id_hovered_in_scene = node_component.id
-
         node_moving_active = imgui.is_item_active()
         if node_widgets_active or node_moving_active:
             self.handle_selected_node(node_component)
         if node_moving_active:
             if imgui.is_mouse_dragging(0):
                 curr_delta = Vec2(*imgui.get_mouse_drag_delta(0))
+                if curr_delta == self.prev_dragging_delta:
+                    # Mouse is held still, keep node and cached scene as they are
+                    return
                 delta = curr_delta - self.prev_dragging_delta
                 node_component.pos = node_component.pos + delta
+                self.invalidate_scene_cache()
                 self.prev_dragging_delta = curr_delta
             else:
                 # NOTE: Reset it only when mouse is not dragging to avoid redundant
                 # calls even when a node is not clicked.
                 self.reset_dragging_delta()
 
+    def find_hovered_node_in_scene(self, offset):
+        """Find the node under mouse cursor on canvas by testing bounding boxes
+        of nodes near it, instead of asking imgui whether each node is hovered
+        while rendering it.
+
+        Note that sizes of nodes are the ones saved in the last frame. And
+        since nodes rendered later are displayed on top, the last matched one
+        is picked.
+
+        Returns
+        -------
+        id_hovered : int
+            ID of hovered node, -1 if there is no node being hovered.
+        """
+        if not imgui.is_window_hovered():
+            return -1
+
+        mx, my = imgui.get_mouse_pos()
+        mx, my = mx - offset.x, my - offset.y
+        id_hovered = -1
+        node_components = self.node_components
+        for i in self.spatial_index.query_point(mx, my):
+            node = node_components[i]
+            pos, size = node.pos, node.size
+            if pos.x <= mx <= pos.x + size.x and pos.y <= my <= pos.y + size.y:
+                id_hovered = node.id
+        return id_hovered
+
     def handle_selected_node(self, node_component):
         self.id_selected = node_component.id
         self.selected_node = node_component
@@ -1440,22 +1751,15 @@ class CodeNodeViewer(ImguiComponent):
             self.highlight_referenced_lines_in_snippet(node_component)
 
     def handle_context_menu_canvas(self):
-        states = [node.is_showing_context_menu for node in self.node_components]
-        is_any_context_menu_showing = any(states)
-
         # NOTE: To prevent confict, show this context menu only when no context menu
         # of node is showing.
-        if not is_any_context_menu_showing:
+        if self._n_context_menus_showing == 0:
             if imgui.begin_popup_context_item('context-menu', 2):
                 if imgui.selectable('Create node')[0]:
-                    init_kwargs = {
-                        'convert_tab_to_spaces': self.app.config.text_input.convert_tab_to_spaces,
-                        'tab_to_spaces_number': self.app.config.text_input.tab_to_spaces_number,
-                    }
                     mouse_pos = Vec2(*imgui.get_mouse_position())
                     node_pos_on_canvas = mouse_pos - self._canvas_screen_pos
                     node_creater = CodeNodeCreatorWindow(
-                        self.app, creation_pos=node_pos_on_canvas, **init_kwargs
+                        self.app, creation_pos=node_pos_on_canvas, **self._node_init_kwargs
                     )
                     node_creater.set_container(self)
                     self.app.add_component(node_creater)
@@ -1466,6 +1770,8 @@ class CodeNodeViewer(ImguiComponent):
             return
         if not imgui.is_any_item_active() and imgui.is_mouse_dragging(1):
             curr_delta = Vec2(*imgui.get_mouse_drag_delta(1))
+            if curr_delta == self.prev_panning_delta:
+                return
             delta = curr_delta - self.prev_panning_delta
             self.panning = self.panning + delta
             self.prev_panning_delta = curr_delta
@@ -1490,113 +1796,289 @@ class CodeNodeViewer(ImguiComponent):
     def reset_highlighted_lines_in_snippet(self):
         if self.id_selected == -1:
             return
-        ids = [v.id for v in self.node_components]
-        selected = self.node_components[ids.index(self.id_selected)]
-        if len(selected.node.roots) == 0:
-            return
-        nodes = [v.node for v in self.node_components]
-        for root in selected.node.roots:
-            idx = nodes.index(root)
-            if self.node_components[idx].snippet_window is not None:
-                self.node_components[idx].snippet_window.reference_info = None
+        # NOTE: `self.selected_node` is always updated along with `self.id_selected`
+        for root in self.selected_node.node.roots:
+            component = self._node_to_component[id(root)]
+            if component.snippet_window is not None:
+                component.snippet_window.reference_info = None
 
     def highlight_referenced_lines_in_snippet(self, node_component):
-        if len(node_component.node.roots) == 0:
-            return
-        nodes = [v.node for v in self.node_components]
         for root in node_component.node.roots:
-            idx = nodes.index(root)
-            if self.node_components[idx].snippet_window is not None:
+            component = self._node_to_component[id(root)]
+            if component.snippet_window is not None:
                 ref_info = node_component.node.ref_infos[root.uuid]
-                self.node_components[idx].snippet_window.reference_info = ref_info
+                component.snippet_window.reference_info = ref_info
 
     def display_grid(self, draw_list):
-        grid_color = imgui.get_color_u32_rgba(0.8, 0.8, 0.8, 0.15)
+        grid_color = self._grid_color
         grid_size = 64.0
-        win_pos = Vec2(*imgui.get_cursor_screen_pos())
-        canvas_size = Vec2(*imgui.get_window_size())
-
-        x = self.panning.x % grid_size
-        while x < canvas_size.x:
-            draw_list.add_line(
-                *(Vec2(x, 0.0) + win_pos),
-                *(Vec2(x, canvas_size.y) + win_pos),
-                grid_color
-            )
-            x += grid_size
-
-        y = self.panning.y % grid_size
-        while y < canvas_size.y:
-            draw_list.add_line(
-                *(Vec2(0.0, y) + win_pos),
-                *(Vec2(canvas_size.x, y) + win_pos),
-                grid_color
-            )
-            y += grid_size
+        wx, wy = imgui.get_cursor_screen_pos()
+        canvas_w, canvas_h = imgui.get_window_size()
+
+        # Screen coordinates of grid lines
+        x0 = self.panning.x % grid_size
+        y0 = self.panning.y % grid_size
+        xs = [wx + x0 + i*grid_size for i in range(math.ceil((canvas_w - x0) / grid_size))]
+        ys = [wy + y0 + i*grid_size for i in range(math.ceil((canvas_h - y0) / grid_size))]
+
+        # Lines of each axis are drawn as a single polyline zigzagging across
+        # the canvas. Segments joining two adjacent lines are placed slightly
+        # outside the canvas, so that they are clipped out.
+        margin = 2.0
+        x_min, y_min = wx - margin, wy - margin
+        x_max, y_max = wx + canvas_w + margin, wy + canvas_h + margin
+
+        points = []
+        for i, x in enumerate(xs):
+            if i % 2 == 0:
+                points += [(x, y_min), (x, y_max)]
+            else:
+                points += [(x, y_max), (x, y_min)]
+        if points:
+            draw_list.add_polyline(points, grid_color, closed=False)
+
+        points = []
+        for i, y in enumerate(ys):
+            if i % 2 == 0:
+                points += [(x_min, y), (x_max, y)]
+            else:
+                points += [(x_max, y), (x_min, y)]
+        if points:
+            draw_list.add_polyline(points, grid_color, closed=False)
 
     def display_links(self, draw_list, offset):
-        draw_list.channels_split(2)
+        if not self.links:
+            return
         draw_list.channels_set_current(0)   # background
 
-        nodes = [v.node for v in self.node_components]
+        # Draw commands are rebuilt only when links, nodes or the view have been
+        # changed since the last frame. Otherwise, the cached ones are replayed.
+        view = (*offset, *self._canvas_screen_pos, *self._canvas_size)
+        cache = self._link_draw_cache
+        if cache is None or cache[0] is not self.links or cache[1] != view:
+            cache = (self.links, view, self._build_link_draw_commands(offset))
+            self._link_draw_cache = cache
+        lines, arcs, slots, arrows = cache[2]
+
+        link_color, slot_color = self._link_color, self._slot_color
+        add_line, add_circle = draw_list.add_line, draw_list.add_circle
+        add_circle_filled, add_polyline = draw_list.add_circle_filled, draw_list.add_polyline
+
+        for x1, y1, x2, y2 in lines:
+            add_line(x1, y1, x2, y2, link_color)
+        for cx, cy, r in arcs:
+            add_circle(cx, cy, r, link_color)
+        for x, y in slots:
+            add_circle_filled(x, y, NODE_SLOT_RADIUS, slot_color, NODE_SLOT_NUM_SEGMENTS)
+        for p_arrow in arrows:
+            add_polyline(p_arrow, link_color, closed=True)
+
+    def _build_link_draw_commands(self, offset):
+        """Compute arguments of draw commands for links by translating their
+        geometry to screen and dropping the ones out of view.
+
+        Returns
+        -------
+        lines, arcs, slots, arrows : list
+            Arguments for drawing straight links `(x1, y1, x2, y2)`, arcs of
+            self-referencing links `(cx, cy, r)`, slots `(x, y)` and arrows
+            `[p1, p2, p3]` on screen.
+        """
+        lines, arcs, slots, arrows = [], [], [], []
+
+        # Geometry of links only depends on nodes, so that it's kept while
+        # canvas is being panned.
+        geometry = self._link_geometry
+        if geometry is None or geometry[0] is not self.links:
+            geometry = (self.links, self._build_link_geometry())
+            self._link_geometry = geometry
+
+        # Visible region on screen, expanded by the size of arrows and slots
+        ox, oy = offset
+        margin = 8.0
+        x_min = self._canvas_screen_pos.x - margin - ox
+        y_min = self._canvas_screen_pos.y - margin - oy
+        x_max = x_min + self._canvas_size.x + 2*margin
+        y_max = y_min + self._canvas_size.y + 2*margin
+
+        for x1, y1, x2, y2, arc, (ax2, ay2, ax3, ay3) in geometry[1]:
+            if arc is not None:
+                cx, cy, r = arc
+                arcs.append((cx + ox, cy + oy, r))
+            elif (
+                (x1 < x_min and x2 < x_min) or (x1 > x_max and x2 > x_max) or
+                (y1 < y_min and y2 < y_min) or (y1 > y_max and y2 > y_max)
+            ):
+                # Both endpoints are on the same side out of view
+                continue
+            else:
+                lines.append((x1 + ox, y1 + oy, x2 + ox, y2 + oy))
+
+            p1 = (x1 + ox, y1 + oy)
+            slots.append(p1)
+            slots.append((x2 + ox, y2 + oy))
+            arrows.append([p1, (ax2 + ox, ay2 + oy), (ax3 + ox, ay3 + oy)])
+
+        return lines, arcs, slots, arrows
+
+    def _build_link_geometry(self):
+        """Compute geometry of links on canvas.
+
+        All positions are in scene coordinates, i.e. the offset of canvas is not
+        included. Callers should add it before drawing.
 
-        link_color = imgui.get_color_u32_rgba(*self.NODE_LINK_COLOR_TUPLE)
-        slot_color = imgui.get_color_u32_rgba(*self.NODE_SLOT_COLOR_TUPLE)
+        Returns
+        -------
+        geometry : list of tuple
+            `(x1, y1, x2, y2, arc, arrow)` for each link, where `(x1, y1)` and
+            `(x2, y2)` are positions of slots, `arc` is `(cx, cy, r)` of the arc
+            for a self-referencing link or None otherwise, and `arrow` is
+            `(x2, y2, x3, y3)` of the other two vertices of arrow at `(x1, y1)`.
+        """
+        geometry = []
+
+        # Memoize slot positions since a node is usually an endpoint of several links
+        components = self._node_to_component
+        root_slot_pos, leaf_slot_pos = {}, {}
 
         # Since angles of arrows are fixed, here we just hard-coded these values
         # in order to reduce calculation
         cos30d, sin30d = 0.8660254037844387, 0.5
 
+        # Endpoints are computed with plain floats, which avoids allocating
+        # several `Vec2` for each link.
         for link in self.links:
-            node_leaf = self.node_components[nodes.index(link.leaf)]
-            node_root = self.node_components[nodes.index(link.root)]
-            p1 = offset + node_leaf.get_root_slot_pos(link.root_slot)
-            p2 = offset + node_root.get_leaf_slot_pos(link.leaf_slot)
+            node_leaf = components[id(link.leaf)]
+            node_root = components[id(link.root)]
+
+            key_root = (node_leaf.id, link.root_slot)
+            p1 = root_slot_pos.get(key_root)
+            if p1 is None:
+                p1 = root_slot_pos[key_root] = tuple(node_leaf.get_root_slot_pos(link.root_slot))
+            key_leaf = (node_root.id, link.leaf_slot)
+            p2 = leaf_slot_pos.get(key_leaf)
+            if p2 is None:
+                p2 = leaf_slot_pos[key_leaf] = tuple(node_root.get_leaf_slot_pos(link.leaf_slot))
+            x1, y1 = p1
+            x2, y2 = p2
+
+            if node_root is node_leaf:
+                # Replace position of root slot with the top middle of node
+                x1 = node_leaf.pos.x + node_leaf.size.x / 2
+                y1 = node_leaf.pos.y
+
+                # vector of "top_mid -> p2", and its length
+                vx, vy = x2 - x1, y2 - y1
+                d = math.sqrt(vx**2 + vy**2)
+
+                # Center of arc is shifted from the middle point of "top_mid -> p2"
+                # against the unit normal vector `(-vy/d, vx/d)` by `d/2`, i.e.
+                # `mid - n*(d/2)`.
+                cx = (x1 + x2)*0.5 + vy*0.5
+                cy = (y1 + y2)*0.5 - vx*0.5
+                arc = (cx, cy, d / 2**0.5)
+
+                # Arrow points downward to the top of node
+                vdx, vdy = 0.0, 8.0
+            else:
+                arc = None
+                vdx, vdy = x1 - x2, y1 - y2
+                d = 8 / math.sqrt(vdx**2 + vdy**2)   # length: 8 pixels
+                vdx, vdy = vdx*d, vdy*d
+
+            arrow = (
+                x1 - (vdx*cos30d + vdy*sin30d), y1 - (-vdx*sin30d + vdy*cos30d),
+                x1 - (vdx*cos30d - vdy*sin30d), y1 - (vdx*sin30d + vdy*cos30d),
+            )
+            geometry.append((x1, y1, x2, y2, arc, arrow))
+
+        return geometry
+
+    def find_node_indices_in_view(self):
+        """Find indices of nodes which should be rendered in current view.
 
-            is_self_referenced = node_root is node_leaf
-            if is_self_referenced:
-                top_mid = offset + node_leaf.pos + Vec2(node_leaf.size.x / 2, 0)
+        Nodes which have not been rendered yet are always included, because
+        their sizes are still the initial value. Otherwise, they might be culled
+        while part of them is visible, and their sizes would never be measured.
+        """
+        # Visible region in scene coordinates
+        view_min_x, view_min_y = -self.panning.x, -self.panning.y
+        view_max_x = view_min_x + self._canvas_size.x
+        view_max_y = view_min_y + self._canvas_size.y
+        candidates = self.spatial_index.intersection(
+            view_min_x, view_min_y, view_max_x, view_max_y
+        )
+
+        indices = set()
+        for i, node in enumerate(self.node_components):
+            if not node.is_size_measured:
+                indices.add(i)
+                continue
+            if i not in candidates:
+                continue
+            pos, size = node.pos, node.size
+            if not (
+                pos.x > view_max_x or pos.x + size.x < view_min_x or
+                pos.y > view_max_y or pos.y + size.y < view_min_y
+            ):
+                indices.add(i)
+        return indices
 
-                # vector of "top_mid -> p2"
-                v_mid_p2 = p2 - top_mid
-                d = math.sqrt(v_mid_p2.x**2 + v_mid_p2.y**2)
+    def display_nodes(self, draw_list, offset):
+        self.id_hovered_in_scene = self.find_hovered_node_in_scene(offset)
 
-                # unit vector of "top_mid -> p2"
-                u_mid_p2 = v_mid_p2 * (1/d)
+        # Resolve roots of selected node once, so that each node can determine
+        # whether it should be highlighted as a root with a set lookup.
+        if self.selected_node is None:
+            self._selected_root_ids = frozenset()
+        else:
+            self._selected_root_ids = frozenset(map(id, self.selected_node.node.roots))
 
-                # unit normal vector
-                un_mid_p2 = Vec2(-u_mid_p2.y, u_mid_p2.x)
+        indices_in_view = self.find_node_indices_in_view()
 
-                p_half = (p2 + top_mid) * 0.5
-                center = p_half - un_mid_p2 * (d/2)
-                r = d / 2**0.5
-                draw_list.add_circle(*center, r, link_color)
+        # Boxes of all nodes are drawn first and then their contents, so that
+        # channels of draw list are switched only once.
+        draw_list.channels_set_current(0)   # background
+        visible_nodes = []
+        for i, node in enumerate(self.node_components):
+            is_out_of_view = i not in indices_in_view
+            # Keep rendering node with context menu opened, otherwise the
+            # popup would be closed once it is panned out of view.
+            if is_out_of_view and not node.is_showing_context_menu:
+                # Nothing to do for most of nodes out of view, unless they have
+                # opened a modal.
+                if node.confirmation_modal:
+                    imgui.push_id(node.id_str)
+                    node.render_windows()
+                    imgui.pop_id()
+                continue
+
+            imgui.push_id(node.id_str)
+            node.render_background(draw_list, offset)
+            imgui.pop_id()
+            visible_nodes.append(node)
 
-                # Replace position of root slot
-                p1 = top_mid
+        draw_list.channels_set_current(1)   # foreground
+        for node in visible_nodes:
+            node.render_foreground(draw_list, offset)
+
+    def render_snippet_windows(self):
+        closed = []
+        for window in self._active_snippet_windows:
+            if window.window_opened:
+                if window.focus_on_next_render:
+                    window.focus_on_next_render = False
+                    imgui.set_next_window_focus()
+                window.render()
             else:
-                draw_list.add_line(*p1, *p2, link_color)
-
-            # Draw slots
-            draw_list.add_circle_filled(*p1, 4.0, slot_color)
-            draw_list.add_circle_filled(*p2, 4.0, slot_color)
-
-            # Draw arrows
-            vd = Vec2(0, 1) if is_self_referenced else (p1 - p2)
-            d = math.sqrt(vd.x**2 + vd.y**2)
-            vd = vd * (8/d)     # length: 8 pixels
-            p_arrow = [
-                p1,
-                p1 - Vec2(vd.x*cos30d + vd.y*sin30d, -vd.x*sin30d + vd.y*cos30d),
-                p1 - Vec2(vd.x*cos30d - vd.y*sin30d, vd.x*sin30d + vd.y*cos30d),
-            ]
-            draw_list.add_polyline(p_arrow, link_color, closed=True)
+                closed.append(window)
 
-    def display_nodes(self, draw_list, offset):
-        for node in self.node_components:
-            imgui.push_id(str(node.id))
-            node.render(draw_list, offset)
-            imgui.pop_id()
+        # Windows have been closed, so we remove their references.
+        for window in closed:
+            self._active_snippet_windows.remove(window)
+            component = self._node_to_component.get(id(window.node))
+            if component is not None and component.snippet_window is window:
+                component.snippet_window = None
 
     def draw_node_list(self):
         imgui.begin_group()
@@ -1604,15 +2086,17 @@ class CodeNodeViewer(ImguiComponent):
         # Reserved space for search box
         height = -23 if self.is_in_search_mode else 0
 
-        imgui.begin_child('node-list', self._node_list_width, height, flags=imgui.WINDOW_HORIZONTAL_SCROLLING_BAR)
+        imgui.begin_child('node-list', self._node_list_width, height, flags=_WINDOW_HORIZONTAL_SCROLLING_BAR)
         imgui.text('nodes')
         imgui.separator()
 
         # Switch to filtered result when search mode is enabled
         node_components = self.filtered_node_components if self.is_in_search_mode else self.node_components
 
-        for node_component in node_components:
-            imgui.push_id(str(node_component.id))
+        # Only rows in the visible region of list are submitted
+        for i in _iter_visible_rows(len(node_components)):
+            node_component = node_components[i]
+            imgui.push_id(node_component.id_str)
             clicked, selected = imgui.selectable(
                 node_component.name, node_component.id == self.id_selected
             )
@@ -1657,6 +2141,8 @@ class CodeNodeViewer(ImguiComponent):
         imgui.pop_style_color()
 
     def draw_node_canvas(self):
+        if not self._colors_ready:
+            self._refresh_colors()
         self.reset_hovered_id_cache()
 
         imgui.begin_group()
@@ -1669,10 +2155,14 @@ class CodeNodeViewer(ImguiComponent):
 
         if self.show_grid:
             self.display_grid(draw_list)
-        self.display_links(draw_list, offset)
-        self.display_nodes(draw_list, offset)
 
-        draw_list.channels_merge()
+        # Links and nodes are drawn into separate channels to keep node contents
+        # on top, so there is nothing to split or merge in an empty scene.
+        if self.node_components:
+            draw_list.channels_split(2)
+            self.display_links(draw_list, offset)
+            self.display_nodes(draw_list, offset)
+            draw_list.channels_merge()
 
         self.handle_panning()
         self.finalize_canvas()
@@ -1684,7 +2174,7 @@ class CodeNodeViewer(ImguiComponent):
             win_width = imgui.get_window_width()
             text_width = len(msg) * CODE_CHAR_WIDTH
             pos = cur_pos + Vec2(win_width - text_width - 100, -20)
-            draw_list.add_text(*pos, imgui.get_color_u32_rgba(1, 1, 0, 1), msg)
+            draw_list.add_text(*pos, self._msg_add_reference_color, msg)
 
         # Display message for root reference removal
         if self.state_cache.get('event__remove_root_reference', False):
@@ -1693,13 +2183,13 @@ class CodeNodeViewer(ImguiComponent):
             win_width = imgui.get_window_width()
             text_width = len(msg) * CODE_CHAR_WIDTH
             pos = cur_pos + Vec2(win_width - text_width - 100, -20)
-            draw_list.add_text(*pos, imgui.get_color_u32_rgba(1, 0, 0, 1), msg)
+            draw_list.add_text(*pos, self._msg_remove_root_reference_color, msg)
 
         imgui.end_group()
 
     def draw_vsplitter(self):
         imgui.begin_group()
-        imgui.invisible_button('##vsplitter', *imgui.Vec2(6, -1))
+        imgui.invisible_button('##vsplitter', 6, -1)
         imgui.end_group()
 
         if imgui.is_item_active():
@@ -1716,7 +2206,8 @@ class CodeNodeViewer(ImguiComponent):
                 self._node_list_width = self.DEFAULT_NODE_LIST_WIDTH
 
     def display_menu_bar(self):
-        imgui.begin_menu_bar()
+        if not imgui.begin_menu_bar():
+            return
         if imgui.begin_menu('File'):
             self.handle_menu_item_save()    # overwrite the original file
             self.handle_menu_item_save_as()
@@ -1739,23 +2230,16 @@ class CodeNodeViewer(ImguiComponent):
         def _close():
             # Unregister events before being closed. Otherwise, this component
             # won't be removed successfully.
-            self.event_registry.unregister(
-                f'add_reference_##{self.window_id}',
-                self.handle_event__add_reference
-            )
-            self.event_registry.unregister(
-                f'remove_root_reference_##{self.window_id}',
-                self.handle_event__remove_root_reference
-            )
-            self.event_registry.unregister(
-                f'create_node_##{self.window_id}',
-                self.handle_event__create_node
-            )
+            for event_name, handler in self._event_handlers:
+                self.event_registry.unregister(event_name, handler)
+            self._event_handlers = []
             self.event_registry = None
             self.terminated = True
 
             self.app.remove_component(self)
             self.node_components = []
+            self._node_to_component = {}
+            self._active_snippet_windows = []
             self.links = []
             self.app = None
 
@@ -1779,10 +2263,7 @@ class CodeNodeViewer(ImguiComponent):
                 show_cancel_button=True,
             )
         else:
-            current_data = self.node_collection.to_dict()
-            saved_data = NodeCollection.load(self.fn_src).to_dict()
-
-            if current_data != saved_data:
+            if self.node_collection.to_dict() != self._saved_data:
                 self.confirmation_modal = ConfirmationModal(
                     'Confirm',
                     'There are unsaved changes, do you want to save them?',
@@ -1815,6 +2296,7 @@ class CodeNodeViewer(ImguiComponent):
         self.draw_node_canvas()
         imgui.end_group()
         self.handle_context_menu_canvas()
+        self.render_snippet_windows()
 
         if self.confirmation_modal:
             self.confirmation_modal.render()
@@ -1836,14 +2318,20 @@ class ErrorMessageModal(ImguiComponent):
         error_msg : str
             Error message.
         """
-        from textwrap import wrap as wrap_text
-
         self.app = app
-        self.error_msg = '\n'.join(wrap_text(error_msg, width=40))
+        self._raw_error_msg = error_msg
+        self._error_msg = None
         self.opened = False
         self.modal_opened = False
         self.close_button_clicked = False
 
+    @property
+    def error_msg(self):
+        """Error message wrapped for display. It's formatted on first access."""
+        if self._error_msg is None:
+            self._error_msg = '\n'.join(wrap_text(self._raw_error_msg, width=40))
+        return self._error_msg
+
     def close(self):
         self.app.remove_component(self)
         self.app = None
@@ -1864,12 +2352,10 @@ class ErrorMessageModal(ImguiComponent):
             'Error', flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE
         )
         if self.modal_opened:
-            imgui.text(f'{self.error_msg}')
+            imgui.text(self.error_msg)
 
-            # HACK: Use an empty label as the anchor to set cursor to center
-            # of current line.
-            imgui.text('')
-            imgui.same_line(imgui.get_window_width()/2 - 21)
+            # Move cursor so that the button is centered in current line
+            imgui.set_cursor_pos_x(imgui.get_window_width()/2 - 21)
             if imgui.button('Close'):
                 self.close()
             imgui.end_popup()
@@ -1897,11 +2383,9 @@ class ConfirmationModal(ImguiComponent):
         if self.modal_opened:
             imgui.text(self.message)
 
-            # HACK: Use an empty label as the anchor to set cursor to center
-            # of current line.
+            # Move cursor so that the buttons are centered in current line
             offset = 60 if self.show_cancel_button else 30
-            imgui.text('')
-            imgui.same_line(imgui.get_window_width()/2 - offset)
+            imgui.set_cursor_pos_x(imgui.get_window_width()/2 - offset)
             if imgui.button('Yes'):
                 if self.callback_yes is not None:
                     self.callback_yes()
@@ -1918,6 +2402,29 @@ class ConfirmationModal(ImguiComponent):
             imgui.end_popup()
 
 
+def _check_filename(filename):
+    """Check whether given filename is valid for a file and whether it exists,
+    with a single `stat()` call.
+
+    Returns
+    -------
+    is_valid : bool
+        False if it's empty, a directory, or it cannot be a path (e.g. there
+        are illegal characters in name).
+    exists : bool
+        True if it exists.
+    """
+    if not filename:
+        return False, False
+    try:
+        st = os.stat(filename)
+    except (FileNotFoundError, NotADirectoryError):
+        return True, False
+    except (OSError, ValueError):
+        return False, False
+    return not stat.S_ISDIR(st.st_mode), True
+
+
 class OpenFileDialog(ImguiComponent):
     INPUT_FILENAME_MAX_LENGTH = 256
 
@@ -1931,7 +2438,7 @@ class OpenFileDialog(ImguiComponent):
             Passed arguments: [filename: str]
         """
         self.app = app
-        self.filename = str(Path('').absolute())
+        self.filename = os.getcwd()
         self.callback = callback
         self.error_msg = ''
         self.window_opened = False
@@ -1943,6 +2450,8 @@ class OpenFileDialog(ImguiComponent):
         self.app.remove_component(self)
 
     def render(self):
+        # Window is not resizable, so its size only has to be set once
+        imgui.set_next_window_size(320, 95, imgui.ONCE)
         _, self.window_opened = imgui.begin(
             'Open file', closable=True,
             flags=imgui.WINDOW_NO_RESIZE | imgui.WINDOW_NO_SAVED_SETTINGS
@@ -1952,8 +2461,6 @@ class OpenFileDialog(ImguiComponent):
             imgui.end()
             return
 
-        imgui.set_window_size(320, 95)
-
         imgui.text('Filename')
         imgui.push_item_width(-1)
         changed, text = imgui.input_text(
@@ -1970,25 +2477,14 @@ class OpenFileDialog(ImguiComponent):
         imgui.same_line(win_width - 28)
 
         if imgui.button('Open') or changed:
-            fn = Path(self.filename)
-            try:
-                # Use this to check whether there are illegal characters in name
-                is_valid = not fn.is_dir()
-            except OSError:
-                is_valid = False
-
+            is_valid, exists = _check_filename(self.filename)
             if not is_valid:
                 self.error_msg = 'Invalid filename.'
-            elif fn.exists():
+            elif exists:
                 self.callback(self.filename)
                 self.close()
-            elif not fn.exists():
-                self.error_msg = 'File does not exist.'
             else:
-                # Should not be here...
-                GlobalState().push_error(ValueError('Cannot resolve filename.'))
-                imgui.end()
-                return
+                self.error_msg = 'File does not exist.'
 
         imgui.end()
 
@@ -2006,7 +2502,7 @@ class SaveFileDialog(ImguiComponent):
             Passed arguments: [filename: str]
         """
         self.app = app
-        self.filename = str(Path('').absolute())
+        self.filename = os.getcwd()
         self.callback = callback
         self.always_on_top = always_on_top
         self.error_msg = ''
@@ -2025,6 +2521,8 @@ class SaveFileDialog(ImguiComponent):
         # not keep setting this window on top.
         if self.always_on_top and self.confirmation_modal is None:
             imgui.set_next_window_focus()
+        # Window is not resizable, so its size only has to be set once
+        imgui.set_next_window_size(320, 95, imgui.ONCE)
         _, self.window_opened = imgui.begin(
             'Save file', closable=True,
             flags=imgui.WINDOW_NO_RESIZE | imgui.WINDOW_NO_SAVED_SETTINGS
@@ -2034,8 +2532,6 @@ class SaveFileDialog(ImguiComponent):
             imgui.end()
             return
 
-        imgui.set_window_size(320, 95)
-
         imgui.text('Filename')
         imgui.push_item_width(-1)
         changed, text = imgui.input_text(
@@ -2050,21 +2546,13 @@ class SaveFileDialog(ImguiComponent):
         imgui.same_line(win_width - 28)
 
         if imgui.button('Save'):
-            fn = Path(self.filename)
-            try:
-                # Use this to check whehter there are illegal characters in name
-                is_valid = not fn.is_dir()
-            except OSError:
-                is_valid = False
-
+            is_valid, exists = _check_filename(self.filename)
             if not is_valid:
                 self.error_msg = 'Invalid filename.'
-            elif not fn.exists():
+            elif not exists:
                 self.callback(self.filename)
                 self.close()
-            elif fn.exists():
-                from textwrap import wrap as wrap_text
-
+            else:
                 self.error_msg = ''
                 msg = (
                     f'File already exists, are you sure you want to overwrite it?'
@@ -2074,11 +2562,6 @@ class SaveFileDialog(ImguiComponent):
                     'Error', msg,
                     callback_yes=lambda: self.callback(self.filename) or self.close(),
                 )
-            else:
-                # Should not be here...
-                GlobalState().push_error(ValueError('Cannot resolve filename.'))
-                imgui.end()
-                return
 
         if self.confirmation_modal:
             self.confirmation_modal.render()
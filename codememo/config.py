@@ -11,12 +11,21 @@ def check_all_keys_exist(template, target):
     if not isinstance(target, dict):
         raise TypeError('`target` should be a dict, got %s' % type(target))
 
-    for k, v in template.items():
-        if k not in target:
-            return False
-        if isinstance(v, dict):
-            if not check_all_keys_exist(v, target[k]):
+    # Nested dicts are checked with a stack of iterators instead of recursion.
+    # Keys are still visited depth-first in the same order as recursion does.
+    stack = [(iter(template.items()), target)]
+    while stack:
+        items, target = stack[-1]
+        for k, v in items:
+            if k not in target:
                 return False
+            if isinstance(v, dict):
+                if not isinstance(target[k], dict):
+                    raise TypeError('`target` should be a dict, got %s' % type(target[k]))
+                stack.append((iter(v.items()), target[k]))
+                break
+        else:
+            stack.pop()
     return True
 
 
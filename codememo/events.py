@@ -4,6 +4,8 @@ __all__ = ['NodeEvent', 'NodeEventRegistry']
 
 
 class NodeEvent(object):
+    __slots__ = ('name', 'event_args')
+
     def __init__(self, name, event_args):
         self.name = name
         self.event_args = event_args
@@ -16,8 +18,17 @@ class NodeEvent(object):
 
 
 class NodeEventRegistry(metaclass=Singleton):
+    """Registry of subscribers of node events.
+
+    Subscribers of an event are notified in the order of registration. Since
+    they are stored as keys of a dict, they should be hashable, and registering
+    the same subscriber again won't make it notified twice.
+    """
     def __init__(self):
         self.registry = {}
+        # Snapshots of subscribers to iterate over in `dispatch()`, they are
+        # rebuilt only after subscribers of an event are changed.
+        self._snapshots = {}
 
     @classmethod
     def get_instance(cls):
@@ -25,23 +36,31 @@ class NodeEventRegistry(metaclass=Singleton):
 
     def clear(self):
         self.registry = {}
+        self._snapshots = {}
 
     def register(self, event_name, subscriber):
         if not callable(subscriber):
             raise TypeError('Subscriber should be a callable.')
+        try:
+            hash(subscriber)
+        except TypeError as ex:
+            raise TypeError(f'Subscriber should be hashable, got {subscriber}') from ex
         if event_name not in self.registry:
-            self.registry.update({event_name: []})
-        self.registry[event_name].append(subscriber)
+            self.registry.update({event_name: {}})
+        # Subscribers are stored as keys of a dict, so that they can be removed
+        # in O(1) while order of registration is still kept.
+        self.registry[event_name][subscriber] = None
+        self._snapshots.pop(event_name, None)
 
     def unregister(self, event_name, subscriber):
         if event_name not in self.registry:
             raise ValueError(f'Event {event_name} has not been registered')
         try:
-            idx = self.registry[event_name].index(subscriber)
-        except ValueError as ex:
+            self.registry[event_name].pop(subscriber)
+        except KeyError as ex:
             msg = f'Subscriber {subscriber} does not exist in list'
             raise ValueError(msg) from ex
-        self.registry[event_name].pop(idx)
+        self._snapshots.pop(event_name, None)
 
     def dispatch(self, event):
         if not isinstance(event, NodeEvent):
@@ -49,5 +68,9 @@ class NodeEventRegistry(metaclass=Singleton):
         if event.name not in self.registry:
             raise ValueError(f'Event {event.name} has not been subscribed by anyone')
 
-        for subscriber in self.registry[event.name]:
+        # Iterate over a snapshot since subscribers might unregister themselves
+        snapshot = self._snapshots.get(event.name)
+        if snapshot is None:
+            snapshot = self._snapshots[event.name] = tuple(self.registry[event.name])
+        for subscriber in snapshot:
             subscriber(event)
@@ -18,22 +18,15 @@ def get_graph_parser(parser_type):
     -------
     parser : an sublcass instance of `BaseParser`
     """
-    import importlib, sys
-    from pathlib import Path
+    import importlib
 
     if parser_type not in PARSER_MODULE_MAP:
         raise ValueError(f'unsupported parser for {parser_type}')
 
+    # Module is executed only at the first time, it's cached in `sys.modules`
+    # for later calls.
     submodule_name = PARSER_MODULE_MAP[parser_type]
-    module_name = f'{__name__}.{submodule_name}'
-
-    this_dir = Path(__file__).parent
-    fn_parser = this_dir.joinpath(f'{submodule_name}.py')
-
-    spec = importlib.util.spec_from_file_location(module_name, fn_parser)
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    sys.modules[module_name] = mod
+    mod = importlib.import_module(f'{__name__}.{submodule_name}')
 
     parser_name = getattr(mod, 'PARSER_IMPL')
     if parser_name is None:
@@ -25,7 +25,7 @@ else:
 THIS_DIR = Path(__file__).parent
 
 EXTRAS_REQUIRE = {
-    'dot': ['networkx>=2.5'],
+    'dot': [],
 }
 # For non-linux users, `pygraphviz` have to be installed manually
 if sys.platform == 'linux':
@@ -54,3 +54,49 @@ class TestDotParser:
         # we cannot guarantee that order of leaf nodes generated by other tools will
         # always match to our implementation.
         assert set(node_links) == set(desired_node_links)
+
+    def test_parse_dot_string(self, tmpdir):
+        content = '\n'.join([
+            'digraph G {',
+            '    "main" [label="main()", shape=box];',
+            '    "foo" [color=red];',
+            '    "bar baz";',
+            '    "isolated";',
+            '    "main" -> "foo" [label="call"];',
+            '    "main" -> "bar baz";',
+            '    "foo" -> "bar baz";',
+            '}',
+        ])
+        fn_dot_file = Path(tmpdir, 'graph.dot')
+        fn_dot_file.write_text(content)
+
+        parser = get_graph_parser('.dot')
+        node_collection = parser.parse(fn_dot_file)
+        nodes = {v.snippet.name: v for v in node_collection}
+
+        # Names of nodes are taken from node ids rather than their labels, and
+        # each node is created only once even it's referenced by several edges.
+        assert len(node_collection) == 4
+        assert set(nodes) == {'main', 'foo', 'bar baz', 'isolated'}
+        assert all(v.snippet.content == '' for v in node_collection)
+
+        node_links = {
+            (link.root.snippet.name, link.leaf.snippet.name)
+            for link in node_collection.resolve_links()
+        }
+        assert node_links == {
+            ('main', 'foo'), ('main', 'bar baz'), ('foo', 'bar baz'),
+        }
+
+        assert {v.snippet.name for v in nodes['main'].leaves} == {'foo', 'bar baz'}
+        assert [v.snippet.name for v in nodes['foo'].leaves] == ['bar baz']
+        assert nodes['bar baz'].leaves == []
+        assert nodes['isolated'].leaves == []
+
+    def test_parse_invalid_extension(self, tmpdir):
+        fn = Path(tmpdir, 'graph.txt')
+        fn.write_text('digraph G {}')
+
+        parser = get_graph_parser('.dot')
+        with pytest.raises(ValueError):
+            parser.parse(fn)
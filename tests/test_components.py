@@ -0,0 +1,206 @@
+import random
+from collections import namedtuple
+from pathlib import Path
+
+import pytest
+
+from codememo.components import (
+    Vec2, CodeNodeViewer, _NodeSpatialHash, _check_filename,
+)
+from codememo.config import AppConfig
+from codememo.objects import Node, NodeCollection, Snippet
+
+
+_Box = namedtuple('_Box', ['pos', 'size'])
+
+
+def _box(x, y, w, h):
+    return _Box(Vec2(x, y), Vec2(w, h))
+
+
+def _scan_point(boxes, x, y):
+    # Linear scan used before the spatial hash was introduced
+    return [
+        i for i, (pos, size) in enumerate(boxes)
+        if pos.x <= x <= pos.x + size.x and pos.y <= y <= pos.y + size.y
+    ]
+
+
+def _scan_region(boxes, x_min, y_min, x_max, y_max):
+    return {
+        i for i, (pos, size) in enumerate(boxes)
+        if pos.x <= x_max and x_min <= pos.x + size.x
+        and pos.y <= y_max and y_min <= pos.y + size.y
+    }
+
+
+def _filter_point(boxes, indices, x, y):
+    return [i for i in indices if i in _scan_point(boxes, x, y)]
+
+
+class _DummyShortcutsRegistry(object):
+    def __init__(self):
+        self.registry = {}
+
+    def register(self, name, shortcut, *args, **kwargs):
+        self.registry[name] = shortcut
+
+
+class _DummyApp(object):
+    def __init__(self):
+        self.config = AppConfig()
+        self.shortcuts_registry = _DummyShortcutsRegistry()
+
+    def add_component(self, component):
+        pass
+
+    def remove_component(self, component):
+        pass
+
+
+class TestCheckFilename:
+    def test__empty_filename(self):
+        assert _check_filename('') == (False, False)
+
+    def test__directory(self, tmpdir):
+        assert _check_filename(str(tmpdir)) == (False, True)
+
+    def test__existing_file(self, tmpdir):
+        fn = Path(tmpdir, 'foo.json')
+        fn.write_text('{}')
+        assert _check_filename(str(fn)) == (True, True)
+
+    def test__non_existing_file(self, tmpdir):
+        fn = Path(tmpdir, 'foo.json')
+        assert _check_filename(str(fn)) == (True, False)
+
+    def test__missing_extension(self, tmpdir):
+        # Extension is not required, it's just a name of file
+        fn = Path(tmpdir, 'foo')
+        assert _check_filename(str(fn)) == (True, False)
+        fn.write_text('{}')
+        assert _check_filename(str(fn)) == (True, True)
+
+    def test__parent_is_a_file(self, tmpdir):
+        fn = Path(tmpdir, 'foo.json')
+        fn.write_text('{}')
+        assert _check_filename(str(fn.joinpath('bar.json'))) == (True, False)
+
+    @pytest.mark.parametrize('filename', ['foo\x00bar', 'x' * 5000])
+    def test__invalid_path(self, filename):
+        assert _check_filename(filename) == (False, False)
+
+
+class TestNodeSpatialHash:
+    def test__query_point(self):
+        boxes = [_box(10, 10, 50, 50), _box(100, 100, 50, 50)]
+        index = _NodeSpatialHash(boxes, cell_size=64.0)
+
+        assert _filter_point(boxes, index.query_point(20, 20), 20, 20) == [0]
+        assert _filter_point(boxes, index.query_point(120, 120), 120, 120) == [1]
+        assert index.query_point(1000, 1000) == []
+
+    def test__node_spanning_cell_boundaries(self):
+        # This node covers 3x3 cells
+        boxes = [_box(50, -50, 200, 150)]
+        index = _NodeSpatialHash(boxes, cell_size=100.0)
+
+        assert len(index.cells) == 9
+        for x, y in [(50, -50), (150, 50), (250, 100), (60, 99), (249, 0)]:
+            assert index.query_point(x, y) == [0]
+        assert index.query_point(-1, 0) == []
+        assert index.intersection(300, 0, 350, 50) == set()
+        assert index.intersection(240, 90, 400, 400) == {0}
+
+    def test__drawing_order_is_preserved(self):
+        boxes = [_box(0, 0, 100, 100) for _ in range(5)]
+        index = _NodeSpatialHash(boxes, cell_size=32.0)
+        assert index.query_point(50, 50) == [0, 1, 2, 3, 4]
+
+    def test__against_linear_scan(self):
+        rng = random.Random(0)
+        boxes = [
+            _box(
+                rng.uniform(-1000, 1000), rng.uniform(-1000, 1000),
+                rng.uniform(1, 300), rng.uniform(1, 300),
+            ) for _ in range(200)
+        ]
+        index = _NodeSpatialHash(boxes, cell_size=128.0)
+
+        for _ in range(500):
+            x, y = rng.uniform(-1200, 1400), rng.uniform(-1200, 1400)
+            candidates = index.query_point(x, y)
+            assert _filter_point(boxes, candidates, x, y) == _scan_point(boxes, x, y)
+
+        for _ in range(200):
+            x0, y0 = rng.uniform(-1200, 1400), rng.uniform(-1200, 1400)
+            x1, y1 = x0 + rng.uniform(0, 500), y0 + rng.uniform(0, 500)
+            candidates = index.intersection(x0, y0, x1, y1)
+            assert _scan_region(boxes, x0, y0, x1, y1) <= candidates
+
+
+class TestCodeNodeViewerSpatialIndex:
+    @pytest.fixture
+    def viewer(self):
+        nodes = [Node(Snippet('foo', 'pass')), Node(Snippet('bar', 'pass'))]
+        viewer = CodeNodeViewer(_DummyApp(), NodeCollection(nodes))
+        for i, node_component in enumerate(viewer.node_components):
+            node_component.pos = Vec2(i * 300.0, 0.0)
+            node_component.size = Vec2(100.0, 100.0)
+        viewer.invalidate_scene_cache()
+        return viewer
+
+    def test__invalidation_after_moving_node(self, viewer):
+        index = viewer.spatial_index
+        assert viewer.spatial_index is index
+        assert index.query_point(50, 50) == [0]
+
+        # Index is cached until it's invalidated explicitly
+        viewer.node_components[0].pos = Vec2(1000.0, 1000.0)
+        assert viewer.spatial_index is index
+
+        viewer.invalidate_scene_cache()
+        assert viewer.spatial_index is not index
+        assert viewer.spatial_index.query_point(50, 50) == []
+        assert viewer.spatial_index.query_point(1050, 1050) == [0]
+
+
+class TestCodeNodeViewerCulling:
+    @pytest.fixture
+    def viewer(self):
+        nodes = [Node(Snippet('foo', 'pass')), Node(Snippet('bar', 'pass'))]
+        viewer = CodeNodeViewer(_DummyApp(), NodeCollection(nodes))
+        viewer.panning = Vec2(0.0, 0.0)
+        viewer._canvas_size = Vec2(800.0, 600.0)
+        return viewer
+
+    def test__node_partly_above_view_is_not_culled(self, viewer):
+        # Only the initial size of node is known before it's rendered. Its
+        # bottom edge is above the view, but the real one might be below it.
+        node = viewer.node_components[0]
+        node.pos = Vec2(100.0, -50.0)
+        viewer.node_components[1].pos = Vec2(-500.0, 100.0)
+        viewer.invalidate_scene_cache()
+        assert viewer.find_node_indices_in_view() == {0, 1}
+
+        # Once the size is measured, it's culled only when it's out of view
+        node.size = Vec2(120.0, 80.0)
+        node.is_size_measured = True
+        viewer.invalidate_scene_cache()
+        assert 0 in viewer.find_node_indices_in_view()
+
+        node.pos = Vec2(100.0, -100.0)
+        viewer.invalidate_scene_cache()
+        assert 0 not in viewer.find_node_indices_in_view()
+
+    def test__node_out_of_view(self, viewer):
+        for i, node in enumerate(viewer.node_components):
+            node.pos = Vec2(i * 1000.0, 0.0)
+            node.size = Vec2(100.0, 100.0)
+            node.is_size_measured = True
+        viewer.invalidate_scene_cache()
+        assert viewer.find_node_indices_in_view() == {0}
+
+        # Pan to the second node
+        viewer.panning = Vec2(-900.0, 0.0)
+        assert viewer.find_node_indices_in_view() == {1}
@@ -33,6 +33,34 @@ def generate_random_file_name(name_length):
     return ''.join([random.choice(string.ascii_letters) for i in range(name_length)])
 
 
+class TestCheckAllKeysExist:
+    def test__nested_keys(self):
+        template = {'a': {'x': 1, 'y': {'z': 2}}, 'b': 1}
+
+        assert mod_config.check_all_keys_exist(template, {'a': {'x': 0, 'y': {'z': 0}}, 'b': 0})
+        # redundant keys in target are allowed
+        assert mod_config.check_all_keys_exist(template, {'a': {'x': 0, 'y': {'z': 0, 'w': 0}}, 'b': 0, 'c': 0})
+
+        assert not mod_config.check_all_keys_exist(template, {'a': {'x': 0, 'y': {}}, 'b': 0})
+        assert not mod_config.check_all_keys_exist(template, {'a': {'y': {'z': 0}}, 'b': 0})
+        assert not mod_config.check_all_keys_exist(template, {'a': {'x': 0, 'y': {'z': 0}}})
+
+    def test__keys_are_checked_in_order(self):
+        # Nested value of 'a' is checked before key 'b', so the invalid type
+        # of it is found first.
+        with pytest.raises(TypeError):
+            mod_config.check_all_keys_exist({'a': {'x': 1}, 'b': 1}, {'a': 5})
+
+        # Missing key 'a' is found before checking the nested value of 'b'
+        assert not mod_config.check_all_keys_exist({'a': 1, 'b': {'x': 1}}, {'b': 5})
+
+    def test__invalid_arguments(self):
+        with pytest.raises(TypeError):
+            mod_config.check_all_keys_exist([], {})
+        with pytest.raises(TypeError):
+            mod_config.check_all_keys_exist({}, [])
+
+
 class TestAppConfig:
     def test__load(self, setup_app_defaults):
         mocked_attrs = setup_app_defaults
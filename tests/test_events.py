@@ -0,0 +1,142 @@
+import pytest
+
+from codememo.events import NodeEvent, NodeEventRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = NodeEventRegistry.get_instance()
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+class TestNodeEventRegistry:
+    def test__singleton(self, registry):
+        assert NodeEventRegistry.get_instance() is registry
+        assert NodeEventRegistry() is registry
+
+    def test__register_and_unregister(self, registry):
+        received = []
+        subscriber = lambda event: received.append(event)
+
+        registry.register('foo', subscriber)
+        event = NodeEvent('foo', {'value': 1})
+        registry.dispatch(event)
+        assert received == [event]
+        assert received[0].get('value') == 1
+
+        registry.unregister('foo', subscriber)
+        registry.dispatch(NodeEvent('foo', {}))
+        assert received == [event]
+
+    def test__register_invalid_subscriber(self, registry):
+        with pytest.raises(TypeError):
+            registry.register('foo', 'not a callable')
+
+    def test__unregister_invalid_subscriber(self, registry):
+        with pytest.raises(ValueError, match='has not been registered'):
+            registry.unregister('foo', lambda event: None)
+
+        registry.register('foo', lambda event: None)
+        with pytest.raises(ValueError, match='does not exist'):
+            registry.unregister('foo', lambda event: None)
+
+    def test__dispatch_unsubscribed_event(self, registry):
+        with pytest.raises(ValueError, match='has not been subscribed'):
+            registry.dispatch(NodeEvent('foo', {}))
+        with pytest.raises(TypeError):
+            registry.dispatch('foo')
+
+    def test__dispatch_order(self, registry):
+        order = []
+        subscribers = [lambda event, i=i: order.append(i) for i in range(5)]
+        for subscriber in subscribers:
+            registry.register('foo', subscriber)
+
+        registry.dispatch(NodeEvent('foo', {}))
+        assert order == [0, 1, 2, 3, 4]
+
+        # Order of remaining subscribers is kept after removing one of them
+        order.clear()
+        registry.unregister('foo', subscribers[2])
+        registry.dispatch(NodeEvent('foo', {}))
+        assert order == [0, 1, 3, 4]
+
+    def test__duplicate_registration(self, registry):
+        received = []
+        subscriber = lambda event: received.append(event)
+
+        # The same subscriber is kept only once, so it's notified only once
+        registry.register('foo', subscriber)
+        registry.register('foo', subscriber)
+        registry.dispatch(NodeEvent('foo', {}))
+        assert len(received) == 1
+
+        registry.unregister('foo', subscriber)
+        with pytest.raises(ValueError):
+            registry.unregister('foo', subscriber)
+
+    def test__bound_methods(self, registry):
+        class Handler:
+            def __init__(self):
+                self.received = []
+
+            def handle(self, event):
+                self.received.append(event)
+
+        handler = Handler()
+        # A new bound method object is created on each access, but they are
+        # considered as the same subscriber.
+        registry.register('foo', handler.handle)
+        registry.dispatch(NodeEvent('foo', {}))
+        registry.unregister('foo', handler.handle)
+        registry.dispatch(NodeEvent('foo', {}))
+        assert len(handler.received) == 1
+
+    def test__unregister_during_dispatch(self, registry):
+        calls = []
+
+        def subscriber_once(event):
+            calls.append('once')
+            registry.unregister('foo', subscriber_once)
+
+        def subscriber(event):
+            calls.append('always')
+
+        registry.register('foo', subscriber_once)
+        registry.register('foo', subscriber)
+
+        # Subscribers after the removed one are still notified
+        registry.dispatch(NodeEvent('foo', {}))
+        assert calls == ['once', 'always']
+
+        registry.dispatch(NodeEvent('foo', {}))
+        assert calls == ['once', 'always', 'always']
+
+    def test__unhashable_subscriber(self, registry):
+        class UnhashableSubscriber:
+            __hash__ = None
+
+            def __call__(self, event):
+                pass
+
+        with pytest.raises(TypeError, match='should be hashable'):
+            registry.register('foo', UnhashableSubscriber())
+        with pytest.raises(ValueError, match='has not been subscribed'):
+            registry.dispatch(NodeEvent('foo', {}))
+
+    def test__subscribers_changed_after_dispatch(self, registry):
+        calls = []
+        registry.register('foo', lambda event: calls.append(1))
+        registry.dispatch(NodeEvent('foo', {}))
+
+        # Subscriber registered after dispatching is notified in the next one
+        subscriber = lambda event: calls.append(2)
+        registry.register('foo', subscriber)
+        registry.dispatch(NodeEvent('foo', {}))
+        assert calls == [1, 1, 2]
+
+        registry.unregister('foo', subscriber)
+        registry.dispatch(NodeEvent('foo', {}))
+        assert calls == [1, 1, 2, 1]